@@ -1,24 +1,116 @@
 from flask import Flask, request
 from flask_cors import CORS
+from flask_session import Session
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 from app.config import Config
+from app.utils.json_provider import OrjsonProvider
+from app.utils.validators import ObjectIdConverter
+from datetime import timedelta
 import os
 
-# MongoDB client (initialized lazily)
+# MongoDB client (created at import, connects on first query)
 mongo_client = None
 db = None
 
+# Model classes holding a cached Collection handle (see bind_collection)
+_bound_models = set()
+
+# Per-client rate limits for public endpoints; counters are kept in MongoDB
+# so every worker/serverless instance shares them
+limiter = Limiter(key_func=get_remote_address)
+
+# Headers added to every response
+_SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'SAMEORIGIN',
+    'X-XSS-Protection': '1; mode=block',
+    'Referrer-Policy': 'strict-origin-when-cross-origin'
+}
+
+# Don't cache sensitive API responses
+_API_NO_CACHE_HEADERS = {
+    'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
+    'Pragma': 'no-cache'
+}
+
+
+def _connect():
+    """Create the MongoDB client without opening any sockets.
+
+    connect=False defers server selection to the first operation, so cold
+    starts and the gunicorn master never block on DNS/TLS, and warm
+    serverless containers keep reusing the same pool.
+    """
+    global mongo_client, db
+    mongo_client = MongoClient(
+        Config.MONGODB_URI,
+        connect=False,
+        maxPoolSize=10,
+        minPoolSize=1,
+        serverSelectionTimeoutMS=5000
+    )
+    # Use 'guruji' as the database name
+    db = mongo_client['guruji']
+
+
+_connect()
+
 
 def get_db():
     """Get MongoDB database instance."""
-    global mongo_client, db
     if db is None:
-        mongo_client = MongoClient(Config.MONGODB_URI)
-        # Use 'guruji' as the database name
-        db = mongo_client['guruji']
+        _connect()
     return db
 
 
+def bind_collection(model):
+    """Resolve a model's Collection once and cache it on the class.
+    
+    Indexes are not touched here, so no request pays for createIndexes;
+    scripts/create_indexes.py builds the models' declared indexes on deploy.
+    """
+    collection = get_db()[model.collection_name]
+    model._collection = collection
+    _bound_models.add(model)
+    return collection
+
+
+def ensure_indexes(model):
+    """Create a model's declared indexes; return the (IndexModel, error) failures.
+    
+    Indexes are created one at a time: a single createIndexes call builds
+    all of its indexes or none, so one unique index rejected by duplicate
+    data would also drop every plain index on the collection.
+    """
+    collection = get_db()[model.collection_name]
+    failures = []
+    for index in model.indexes:
+        try:
+            collection.create_indexes([index])
+        except PyMongoError as e:
+            failures.append((index, e))
+    return failures
+
+
+def reset_connection():
+    """Drop the client and cached collection handles (e.g. after fork)."""
+    global mongo_client, db
+    mongo_client = None
+    db = None
+    for model in _bound_models:
+        model._collection = None
+    _bound_models.clear()
+
+
+# PyMongo clients are not fork-safe; make forked workers build their own
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_connection)
+
+
 def create_app():
     """Flask application factory."""
     app = Flask(
@@ -30,34 +122,72 @@ def create_app():
     # Load configuration
     app.config.from_object(Config)
     
+    # jsonify/get_json go through orjson
+    app.json = OrjsonProvider(app)
+    
+    # <oid:...> route params arrive as ObjectIds, parsed once per request
+    app.url_map.converters['oid'] = ObjectIdConverter
+    
     # Security settings
-    app.config['SESSION_COOKIE_SECURE'] = os.getenv('FLASK_ENV') != 'development'
+    app.config['SESSION_COOKIE_SECURE'] = Config.FLASK_ENV != 'development'
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     
+    # Server-side sessions: the cookie only carries a signed session id,
+    # OAuth state and pending user ids live in the 'sessions' collection.
+    # Sessions must be permanent: Flask-Session's MongoDB backend stores
+    # non-permanent ones without an expiry and then fails to load them.
+    # They only hold the Google connect flow, so an hour is plenty.
+    app.config.update(
+        SESSION_TYPE='mongodb',
+        SESSION_MONGODB=mongo_client,
+        SESSION_MONGODB_DB='guruji',
+        SESSION_MONGODB_COLLECT='sessions',
+        SESSION_USE_SIGNER=True,
+        SESSION_PERMANENT=True,
+        PERMANENT_SESSION_LIFETIME=timedelta(hours=1)
+    )
+    Session(app)
+    
+    # Rate limiting; behind trusted proxies the client IP comes from
+    # X-Forwarded-For, otherwise the socket address is used as-is
+    if Config.TRUSTED_PROXY_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS)
+    app.config['RATELIMIT_STORAGE_URI'] = Config.MONGODB_URI or 'memory://'
+    limiter.init_app(app)
+    
     # Enable CORS with restricted origins
-    allowed_origins = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5000,http://127.0.0.1:5000').split(',')
-    CORS(app, origins=allowed_origins, supports_credentials=True)
+    CORS(app, origins=sorted(Config.ALLOWED_ORIGINS), supports_credentials=True)
     
     # Security headers middleware
     @app.after_request
     def add_security_headers(response):
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'SAMEORIGIN'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        # Don't cache sensitive API responses
-        if request.path.startswith('/api/'):
-            response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-            response.headers['Pragma'] = 'no-cache'
+        # update() replaces existing values, same as item assignment
+        response.headers.update(_SECURITY_HEADERS)
+        # Responses explicitly marked public (e.g. certificate renders) keep their caching
+        if request.path.startswith('/api/') and not response.cache_control.public:
+            response.headers.update(_API_NO_CACHE_HEADERS)
         return response
     
     # Context processor to make config available in templates
+    template_context = {'config': Config}
+    
     @app.context_processor
     def inject_config():
-        return {'config': Config}
+        return template_context
+    
+    _register_blueprints(app)
     
-    # Register blueprints
+    return app
+
+
+def _register_blueprints(app):
+    """Import and register all route blueprints.
+    
+    Route modules keep heavy third-party imports (Pillow/ReportLab, Google
+    API clients) inside the handlers that need them, so importing
+    them here stays cheap on serverless cold starts.
+    """
     from app.routes.main import main_bp
     from app.routes.auth import auth_bp
     from app.routes.courses import courses_bp
@@ -76,5 +206,3 @@ def create_app():
     app.register_blueprint(recordings_bp, url_prefix='/api')
     app.register_blueprint(notes_bp)
     app.register_blueprint(certificates_bp)
-    
-    return app
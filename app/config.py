@@ -1,18 +1,61 @@
 import os
 import secrets
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _dev_secret_key() -> str:
+    """Return a development SECRET_KEY that survives restarts.
+    
+    The key is kept in the system temp dir so sessions aren't invalidated
+    every time the dev server (or a local serverless emulator) restarts.
+    """
+    path = os.path.join(tempfile.gettempdir(), '.flask_secret')
+    try:
+        with open(path) as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except OSError:
+        pass
+    
+    key = secrets.token_hex(32)
+    try:
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            f.write(key)
+    except OSError:
+        pass
+    return key
+
+
 class Config:
     """Application configuration loaded from environment variables."""
     
-    # Flask - Generate random secret if not provided (log warning in production)
+    # Runtime environment ('development' relaxes cookie/OAuth transport rules)
+    FLASK_ENV = os.getenv('FLASK_ENV')
+    
+    # Flask - SECRET_KEY is required outside development. A generated key
+    # would change on every cold start and silently log everyone out.
     SECRET_KEY = os.getenv('SECRET_KEY')
     if not SECRET_KEY:
-        SECRET_KEY = secrets.token_hex(32)
-        print("WARNING: Using generated SECRET_KEY. Set SECRET_KEY environment variable in production!")
+        if FLASK_ENV != 'development':
+            raise RuntimeError("SECRET_KEY environment variable must be set (or set FLASK_ENV=development)")
+        SECRET_KEY = _dev_secret_key()
+        print("WARNING: Using a generated development SECRET_KEY. Set SECRET_KEY in production!")
+    
+    # CORS - comma-separated list of allowed origins, parsed once
+    ALLOWED_ORIGINS = frozenset(
+        origin.strip()
+        for origin in os.getenv('ALLOWED_ORIGINS', 'http://localhost:5000,http://127.0.0.1:5000').split(',')
+        if origin.strip()
+    )
+    
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is
+    # trusted for the client IP (rate limiting). Vercel's edge is one hop;
+    # with no proxy it must stay 0, or clients could spoof their address.
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1' if os.getenv('VERCEL') else '0'))
     
     # MongoDB
     MONGODB_URI = os.getenv('MONGODB_URI')
@@ -1 +1,24 @@
 # Models package
+from bson import ObjectId
+
+
+def as_object_id(value):
+    """Coerce a hex string to ObjectId; ObjectIds and None pass through."""
+    if value.__class__ is ObjectId:
+        return value
+    if isinstance(value, str):
+        # Fast path for the 24-char hex ids that arrive from URLs: decode
+        # straight into the ObjectId slot, skipping __init__'s type dispatch
+        if len(value) == 24:
+            try:
+                raw = bytes.fromhex(value)
+            except ValueError:
+                raw = None
+            # fromhex skips whitespace, so check we really got 12 bytes
+            if raw is not None and len(raw) == 12:
+                oid = ObjectId.__new__(ObjectId)
+                oid._ObjectId__id = raw
+                return oid
+        # Anything else goes through ObjectId so errors raise InvalidId
+        return ObjectId(value)
+    return value
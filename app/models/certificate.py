@@ -1,8 +1,11 @@
 from datetime import datetime
-from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+import base64
 import secrets
-import string
-from app import get_db
+from app import bind_collection
+from app.models import as_object_id
+from app.utils.cache import TTLCache
 
 
 class Certificate:
@@ -10,39 +13,65 @@ class Certificate:
     
     collection_name = 'certificates'
     
+    indexes = [
+        IndexModel('certificate_code', unique=True),
+        IndexModel([('student_id', ASCENDING), ('course_id', ASCENDING)], unique=True),
+        IndexModel([('student_id', ASCENDING), ('issued_at', DESCENDING)])
+    ]
+    
+    # Shapes documents for the JSON API inside MongoDB (ObjectIds as strings,
+    # issued_at in datetime.isoformat() layout) so nothing is rewritten in Python
+    SERIALIZED_PROJECTION = {
+        '_id': {'$toString': '$_id'},
+        'student_id': {'$toString': '$student_id'},
+        'course_id': {'$toString': '$course_id'},
+        'certificate_code': 1,
+        'student_name': 1,
+        'course_title': 1,
+        'instructor_name': 1,
+        'attendance_count': 1,
+        'total_classes': 1,
+        'attendance_percentage': 1,
+        'issued_at': {'$dateToString': {'date': '$issued_at', 'format': '%Y-%m-%dT%H:%M:%S.%L000'}},
+        'is_valid': 1
+    }
+    
+    _collection = None
+    
+    # Issued certificates are effectively immutable; the public verify and
+    # render endpoints read them by code, so keep recent ones in memory
+    _code_cache = TTLCache(maxsize=4096, ttl=300)
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
-    def generate_code(cls, length=12):
-        """Generate a unique certificate verification code."""
-        alphabet = string.ascii_uppercase + string.digits
-        while True:
-            code = ''.join(secrets.choice(alphabet) for _ in range(length))
-            # Format as XXXX-XXXX-XXXX
-            formatted_code = f"{code[:4]}-{code[4:8]}-{code[8:12]}"
-            # Check if code already exists
-            if not cls.get_collection().find_one({'certificate_code': formatted_code}):
-                return formatted_code
+    def generate_code(cls):
+        """Generate a certificate verification code.
+        
+        Uniqueness is enforced by the certificate_code index; create()
+        retries on the (astronomically unlikely) collision.
+        """
+        # One CSPRNG read, base32-encoded (A-Z, 2-7): 12 chars = 60 bits
+        code = base64.b32encode(secrets.token_bytes(8)).decode()
+        # Format as XXXX-XXXX-XXXX
+        return f"{code[:4]}-{code[4:8]}-{code[8:12]}"
     
     @classmethod
     def create(cls, student_id, course_id, student_name: str, course_title: str, 
                instructor_name: str, attendance_count: int, total_classes: int,
                attendance_percentage: float):
-        """Create a new certificate."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        """Create a new certificate, or return the one already issued.
         
-        # Check if certificate already exists
-        existing = cls.get_collection().find_one({
-            'student_id': student_id,
-            'course_id': course_id
-        })
-        if existing:
-            return existing
+        Relies on the unique (student_id, course_id) index instead of a
+        find-then-insert, so concurrent requests can't issue duplicates.
+        Returns (certificate, created).
+        """
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         
         certificate = {
             'student_id': student_id,
@@ -57,40 +86,61 @@ class Certificate:
             'issued_at': datetime.utcnow(),
             'is_valid': True
         }
-        result = cls.get_collection().insert_one(certificate)
-        certificate['_id'] = result.inserted_id
-        return certificate
+        while True:
+            try:
+                result = cls.get_collection().insert_one(certificate)
+            except DuplicateKeyError:
+                existing = cls.find_by_student_and_course(student_id, course_id)
+                if existing:
+                    return existing, False
+                # Certificate code collision - retry with a fresh code
+                certificate.pop('_id', None)
+                certificate['certificate_code'] = cls.generate_code()
+                continue
+            certificate['_id'] = result.inserted_id
+            return certificate, True
     
     @classmethod
     def find_by_code(cls, certificate_code: str):
-        """Find certificate by verification code."""
-        return cls.get_collection().find_one({'certificate_code': certificate_code.upper()})
+        """Find certificate by verification code.
+        
+        Results are cached per process; treat the returned dict as read-only.
+        """
+        certificate_code = certificate_code.upper()
+        certificate = cls._code_cache.get(certificate_code)
+        if certificate is None:
+            certificate = cls.get_collection().find_one({'certificate_code': certificate_code})
+            if certificate:
+                cls._code_cache.set(certificate_code, certificate)
+        return certificate
     
     @classmethod
-    def find_by_student(cls, student_id):
-        """Get all certificates for a student."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        return list(cls.get_collection().find({'student_id': student_id}))
+    def iter_by_student_serialized(cls, student_id):
+        """Cursor over a student's certificates, already JSON-ready."""
+        student_id = as_object_id(student_id)
+        return cls.get_collection().find(
+            {'student_id': student_id}, cls.SERIALIZED_PROJECTION
+        ).sort('issued_at', 1)
     
     @classmethod
-    def find_by_student_and_course(cls, student_id, course_id):
+    def find_by_student_and_course(cls, student_id, course_id, projection: dict = None):
         """Get certificate for a specific student and course."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().find_one({
             'student_id': student_id,
             'course_id': course_id
-        })
+        }, projection)
     
     @classmethod
     def invalidate(cls, certificate_id):
         """Invalidate a certificate."""
-        if isinstance(certificate_id, str):
-            certificate_id = ObjectId(certificate_id)
-        return cls.get_collection().update_one(
+        certificate_id = as_object_id(certificate_id)
+        certificate = cls.get_collection().find_one_and_update(
             {'_id': certificate_id},
-            {'$set': {'is_valid': False}}
+            {'$set': {'is_valid': False}},
+            projection={'certificate_code': 1}
         )
+        if certificate:
+            cls._code_cache.delete(certificate['certificate_code'])
+        return certificate
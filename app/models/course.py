@@ -1,6 +1,9 @@
 from datetime import datetime
-from bson import ObjectId
-from app import get_db
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app import bind_collection
+from app.models import as_object_id
+from app.utils.cache import TTLCache
+from app.utils.parallel import run_parallel
 
 
 class Course:
@@ -8,20 +11,43 @@ class Course:
     
     collection_name = 'courses'
     
+    indexes = [
+        IndexModel([('is_published', ASCENDING), ('created_at', DESCENDING)]),
+        IndexModel([('instructor_id', ASCENDING), ('created_at', DESCENDING)])
+    ]
+    
+    # Fields needed to render a course card (catalog, landing, recommendations)
+    CARD_PROJECTION = {
+        'title': 1,
+        'description': 1,
+        'thumbnail': 1,
+        'price': 1,
+        'instructor_id': 1,
+        'is_completed': 1
+    }
+    
+    _collection = None
+    
+    # The public catalog (landing, /courses) is rebuilt at most once a
+    # minute per process; course writes below drop it immediately
+    _catalog_cache = TTLCache(maxsize=1, ttl=60)
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
-    def create(cls, title: str, description: str, instructor_id, thumbnail: str = None, price: float = 0):
+    def create(cls, title: str, description: str, instructor_id, thumbnail: str = None, price: float = 0, instructor_name: str = None):
         """Create a new course."""
-        if isinstance(instructor_id, str):
-            instructor_id = ObjectId(instructor_id)
+        instructor_id = as_object_id(instructor_id)
         
         course = {
             'title': title,
             'description': description,
             'instructor_id': instructor_id,
+            'instructor_name': instructor_name,  # Denormalized from users
             'thumbnail': thumbnail,
             'price': price,
             'is_published': False,
@@ -33,58 +59,168 @@ class Course:
         return course
     
     @classmethod
-    def find_by_id(cls, course_id):
-        """Find course by ID."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return cls.get_collection().find_one({'_id': course_id})
+    def find_by_id(cls, course_id, projection: dict = None):
+        """Find course by ID, optionally limited to some fields."""
+        course_id = as_object_id(course_id)
+        return cls.get_collection().find_one({'_id': course_id}, projection)
     
     @classmethod
-    def find_all_published(cls):
-        """Get all published courses."""
-        return list(cls.get_collection().find({'is_published': True}).sort('created_at', -1))
+    def find_with_completed_count(cls, course_id, fields: dict, now: datetime):
+        """Find a course with `completed_classes` counted inside MongoDB.
+        
+        A class counts once it is marked completed or its start time has
+        passed; classes without a datetime are ignored. Only `fields` and
+        the count come back, not the scheduled_classes array.
+        """
+        course_id = as_object_id(course_id)
+        completed = {'$size': cls._scheduled_classes_filter(now, completed=True)}
+        return cls.get_collection().find_one(
+            {'_id': course_id},
+            dict(fields, completed_classes=completed)
+        )
     
     @classmethod
-    def find_by_instructor(cls, instructor_id):
-        """Get all courses by instructor."""
-        if isinstance(instructor_id, str):
-            instructor_id = ObjectId(instructor_id)
-        return list(cls.get_collection().find({'instructor_id': instructor_id}).sort('created_at', -1))
+    def find_with_class_split(cls, course_id, now: datetime):
+        """Find a course with scheduled_classes split server-side into
+        `upcoming_classes` and `completed_classes` (same rule as above).
+        """
+        course_id = as_object_id(course_id)
+        courses = cls.get_collection().aggregate([
+            {'$match': {'_id': course_id}},
+            {'$addFields': {
+                'upcoming_classes': cls._scheduled_classes_filter(now, completed=False),
+                'completed_classes': cls._scheduled_classes_filter(now, completed=True)
+            }},
+            {'$project': {'scheduled_classes': 0}}
+        ])
+        return next(courses, None)
+    
+    @classmethod
+    def _scheduled_classes_filter(cls, now: datetime, completed: bool) -> dict:
+        """$filter expression selecting completed or upcoming scheduled classes.
+        
+        A class is completed once marked so or its start time has passed;
+        classes without a datetime are in neither list.
+        """
+        is_done = {'$or': [
+            {'$eq': ['$$s.is_completed', True]},
+            {'$lte': ['$$s.datetime', now]}
+        ]}
+        return {
+            '$filter': {
+                'input': {'$ifNull': ['$scheduled_classes', []]},
+                'as': 's',
+                'cond': {
+                    '$and': [
+                        {'$eq': [{'$type': '$$s.datetime'}, 'date']},
+                        is_done if completed else {'$not': [is_done]}
+                    ]
+                }
+            }
+        }
+    
+    @classmethod
+    def find_all_published(cls, projection: dict = None):
+        """Get all published courses, optionally limited to some fields."""
+        return list(cls.get_collection().find({'is_published': True}, projection).sort('created_at', -1))
+    
+    @classmethod
+    def find_published_with_stats(cls):
+        """Published course cards joined with instructor name and student count.
+        
+        One aggregation instead of a user lookup and an enrollment count
+        per course. Cached briefly; treat the result as read-only.
+        """
+        courses = cls._catalog_cache.get('published')
+        if courses is not None:
+            return courses
+        
+        from app.models.enrollment import Enrollment
+        from app.models.user import User
+        
+        pipeline = [
+            {'$match': {'is_published': True}},
+            {'$sort': {'created_at': -1}},
+            {'$project': cls.CARD_PROJECTION},
+            {'$lookup': {
+                'from': User.collection_name,
+                'let': {'instructor_id': '$instructor_id'},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$_id', '$$instructor_id']}}},
+                    {'$project': {'name': 1}}
+                ],
+                'as': 'instructor'
+            }},
+            {'$unwind': {'path': '$instructor', 'preserveNullAndEmptyArrays': True}},
+            {'$lookup': {
+                'from': Enrollment.collection_name,
+                'let': {'course_id': '$_id'},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$course_id', '$$course_id']}}},
+                    {'$count': 'n'}
+                ],
+                'as': 'enrollment_stats'
+            }},
+            {'$addFields': {
+                'student_count': {'$ifNull': [{'$arrayElemAt': ['$enrollment_stats.n', 0]}, 0]}
+            }},
+            {'$project': {'enrollment_stats': 0}}
+        ]
+        courses = list(cls.get_collection().aggregate(pipeline))
+        cls._catalog_cache.set('published', courses)
+        return courses
+    
+    @classmethod
+    def find_by_instructor(cls, instructor_id, projection: dict = None):
+        """Get all courses by instructor, optionally limited to some fields."""
+        instructor_id = as_object_id(instructor_id)
+        return list(cls.get_collection().find({'instructor_id': instructor_id}, projection).sort('created_at', -1))
     
     @classmethod
     def update(cls, course_id, data: dict):
         """Update course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return cls.get_collection().update_one({'_id': course_id}, {'$set': data})
+        course_id = as_object_id(course_id)
+        result = cls.get_collection().update_one({'_id': course_id}, {'$set': data})
+        cls._catalog_cache.clear()
+        return result
+    
+    @classmethod
+    def set_instructor_name(cls, instructor_id, name: str):
+        """Refresh the denormalized instructor name on all of an instructor's courses."""
+        instructor_id = as_object_id(instructor_id)
+        return cls.get_collection().update_many(
+            {'instructor_id': instructor_id},
+            {'$set': {'instructor_name': name}}
+        )
     
     @classmethod
     def add_scheduled_class(cls, course_id, class_data: dict):
         """Add a scheduled class to course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().update_one(
             {'_id': course_id},
             {'$push': {'scheduled_classes': class_data}}
         )
     
     @classmethod
-    def remove_scheduled_class(cls, course_id, event_id: str):
-        """Remove a scheduled class."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+    def remove_scheduled_class(cls, course_id, event_id: str, instructor_id=None):
+        """Remove a scheduled class, only from `instructor_id`'s course if given."""
+        query = {'_id': as_object_id(course_id), 'scheduled_classes.calendar_event_id': event_id}
+        if instructor_id is not None:
+            query['instructor_id'] = instructor_id
         return cls.get_collection().update_one(
-            {'_id': course_id},
+            query,
             {'$pull': {'scheduled_classes': {'calendar_event_id': event_id}}}
         )
     
     @classmethod
-    def mark_class_completed(cls, course_id, event_id: str):
-        """Mark a scheduled class as completed."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+    def mark_class_completed(cls, course_id, event_id: str, instructor_id=None):
+        """Mark a scheduled class as completed, only on `instructor_id`'s course if given."""
+        query = {'_id': as_object_id(course_id), 'scheduled_classes.calendar_event_id': event_id}
+        if instructor_id is not None:
+            query['instructor_id'] = instructor_id
         return cls.get_collection().update_one(
-            {'_id': course_id, 'scheduled_classes.calendar_event_id': event_id},
+            query,
             {'$set': {'scheduled_classes.$.is_completed': True}}
         )
     
@@ -101,6 +237,27 @@ class Course:
     @classmethod
     def delete(cls, course_id):
         """Delete a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return cls.get_collection().delete_one({'_id': course_id})
+        course_id = as_object_id(course_id)
+        result = cls.get_collection().delete_one({'_id': course_id})
+        cls._catalog_cache.clear()
+        return result
+    
+    @classmethod
+    def delete_cascade(cls, course_id):
+        """Delete a course along with its recordings, notes and enrollments.
+        
+        The dependent deletes are independent and run concurrently; the
+        course itself goes last so a failure never leaves orphaned data
+        behind an already-deleted course.
+        """
+        from app.models.enrollment import Enrollment
+        from app.models.note import Note
+        from app.models.recording import Recording
+        
+        course_id = as_object_id(course_id)
+        run_parallel(
+            lambda: Recording.delete_by_course(course_id),
+            lambda: Note.delete_by_course(course_id),
+            lambda: Enrollment.delete_by_course(course_id)
+        )
+        return cls.delete(course_id)
@@ -1,6 +1,9 @@
 from datetime import datetime
-from bson import ObjectId
-from app import get_db
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+from app import bind_collection
+from app.models import as_object_id
+from app.models.course import Course
 
 
 class Enrollment:
@@ -8,25 +11,31 @@ class Enrollment:
     
     collection_name = 'enrollments'
     
+    indexes = [
+        IndexModel([('student_id', ASCENDING), ('course_id', ASCENDING)], unique=True),
+        # Per-course reads (student counts, rosters, catalog $lookup) can't
+        # use the student-first compound index
+        IndexModel('course_id')
+    ]
+    
+    _collection = None
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
     def create(cls, student_id, course_id):
-        """Enroll a student in a course."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        """Enroll a student in a course, or return the existing enrollment.
         
-        # Check if already enrolled
-        existing = cls.get_collection().find_one({
-            'student_id': student_id,
-            'course_id': course_id
-        })
-        if existing:
-            return existing
+        Relies on the unique (student_id, course_id) index instead of a
+        find-then-insert, so concurrent requests (a double click) can't race.
+        Returns (enrollment, created).
+        """
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         
         enrollment = {
             'student_id': student_id,
@@ -36,31 +45,79 @@ class Enrollment:
             'attendance': [],  # List of class IDs attended
             'attendance_count': 0
         }
-        result = cls.get_collection().insert_one(enrollment)
+        try:
+            result = cls.get_collection().insert_one(enrollment)
+        except DuplicateKeyError:
+            return cls.find_one(student_id, course_id), False
         enrollment['_id'] = result.inserted_id
-        return enrollment
+        return enrollment, True
     
     @classmethod
     def find_by_student(cls, student_id):
         """Get all enrollments for a student."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
+        student_id = as_object_id(student_id)
         return list(cls.get_collection().find({'student_id': student_id}))
     
+    @classmethod
+    def find_by_student_with_courses(cls, student_id):
+        """Get a student's enrollments with the course joined in as 'course'.
+        
+        One aggregation instead of a find_by_id per enrollment; enrollments
+        whose course has been deleted are dropped.
+        """
+        return list(cls.iter_by_student_with_courses(student_id))
+    
+    @classmethod
+    def iter_by_student_with_courses(cls, student_id):
+        """Cursor form of find_by_student_with_courses, for streaming."""
+        student_id = as_object_id(student_id)
+        return cls.get_collection().aggregate([
+            {'$match': {'student_id': student_id}},
+            {'$lookup': {
+                'from': Course.collection_name,
+                'localField': 'course_id',
+                'foreignField': '_id',
+                'as': 'course'
+            }},
+            {'$unwind': '$course'}
+        ])
+    
     @classmethod
     def find_by_course(cls, course_id):
         """Get all enrollments for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return list(cls.get_collection().find({'course_id': course_id}))
     
+    @classmethod
+    def iter_roster(cls, course_id):
+        """Cursor over a course's enrollments with the student's name/email.
+        
+        Each item carries `student` ({_id, name, email}); enrollments whose
+        user no longer exists are dropped.
+        """
+        from app.models.user import User
+        
+        course_id = as_object_id(course_id)
+        return cls.get_collection().aggregate([
+            {'$match': {'course_id': course_id}},
+            {'$project': {'student_id': 1, 'enrolled_at': 1, 'progress': 1}},
+            {'$lookup': {
+                'from': User.collection_name,
+                'let': {'student_id': '$student_id'},
+                'pipeline': [
+                    {'$match': {'$expr': {'$eq': ['$_id', '$$student_id']}}},
+                    {'$project': {'name': 1, 'email': 1}}
+                ],
+                'as': 'student'
+            }},
+            {'$unwind': '$student'}
+        ])
+    
     @classmethod
     def find_one(cls, student_id, course_id):
         """Get a specific enrollment."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().find_one({
             'student_id': student_id,
             'course_id': course_id
@@ -69,22 +126,20 @@ class Enrollment:
     @classmethod
     def is_enrolled(cls, student_id, course_id) -> bool:
         """Check if student is enrolled in course."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return cls.get_collection().find_one({
-            'student_id': student_id,
-            'course_id': course_id
-        }) is not None
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
+        # Covered query: the projection only names fields of the unique
+        # (student_id, course_id) index, so no document is read at all
+        return cls.get_collection().find_one(
+            {'student_id': student_id, 'course_id': course_id},
+            projection={'_id': 0, 'student_id': 1}
+        ) is not None
     
     @classmethod
     def update_progress(cls, student_id, course_id, recording_id: str, watched: bool = True):
         """Update watch progress for a recording."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         
         return cls.get_collection().update_one(
             {'student_id': student_id, 'course_id': course_id},
@@ -93,24 +148,31 @@ class Enrollment:
     
     @classmethod
     def mark_attendance(cls, student_id, course_id, class_id: str):
-        """Mark attendance for a class."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        """Mark attendance for a class.
         
-        # Add class_id to attendance array if not already present
+        Returns True if marked, False if already marked for this class and
+        None if the student is not enrolled, all in a single round trip.
+        """
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
+        
+        # Append class_id only if absent (set semantics, order kept) and
+        # derive attendance_count from the array so the two can't drift.
+        # Pipeline update, so a repeat mark leaves the document unmodified.
+        attendance = {'$ifNull': ['$attendance', []]}
         result = cls.get_collection().update_one(
-            {
-                'student_id': student_id,
-                'course_id': course_id,
-                'attendance': {'$ne': class_id}
-            },
-            {
-                '$push': {'attendance': class_id},
-                '$inc': {'attendance_count': 1}
-            }
+            {'student_id': student_id, 'course_id': course_id},
+            [
+                {'$set': {'attendance': {'$cond': [
+                    {'$in': [{'$literal': class_id}, attendance]},
+                    attendance,
+                    {'$concatArrays': [attendance, [{'$literal': class_id}]]}
+                ]}}},
+                {'$set': {'attendance_count': {'$size': '$attendance'}}}
+            ]
         )
+        if result.matched_count == 0:
+            return None
         return result.modified_count > 0
     
     @classmethod
@@ -124,17 +186,29 @@ class Enrollment:
     @classmethod
     def count_by_course(cls, course_id) -> int:
         """Count enrollments for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().count_documents({'course_id': course_id})
     
+    @classmethod
+    def count_by_courses(cls, course_ids) -> dict:
+        """Count enrollments for several courses with one grouped query.
+        
+        Returns {course_id: count}; courses with none are absent.
+        """
+        course_ids = [as_object_id(course_id) for course_id in course_ids]
+        if not course_ids:
+            return {}
+        groups = cls.get_collection().aggregate([
+            {'$match': {'course_id': {'$in': course_ids}}},
+            {'$group': {'_id': '$course_id', 'n': {'$sum': 1}}}
+        ])
+        return {group['_id']: group['n'] for group in groups}
+    
     @classmethod
     def delete(cls, student_id, course_id):
         """Remove enrollment."""
-        if isinstance(student_id, str):
-            student_id = ObjectId(student_id)
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        student_id = as_object_id(student_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().delete_one({
             'student_id': student_id,
             'course_id': course_id
@@ -143,6 +217,5 @@ class Enrollment:
     @classmethod
     def delete_by_course(cls, course_id):
         """Delete all enrollments for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().delete_many({'course_id': course_id})
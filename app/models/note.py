@@ -1,6 +1,7 @@
 from datetime import datetime
-from bson import ObjectId
-from app import get_db
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app import bind_collection
+from app.models import as_object_id
 
 
 class Note:
@@ -8,15 +9,32 @@ class Note:
     
     collection_name = 'notes'
     
+    indexes = [
+        IndexModel([('course_id', ASCENDING), ('created_at', DESCENDING)])
+    ]
+    
+    # find() projection that returns notes already JSON-ready
+    SERIALIZED_PROJECTION = {
+        '_id': {'$toString': '$_id'},
+        'course_id': {'$toString': '$course_id'},
+        'title': 1,
+        'drive_link': 1,
+        'description': 1,
+        'created_at': {'$dateToString': {'date': '$created_at', 'format': '%Y-%m-%dT%H:%M:%S.%L000'}}
+    }
+    
+    _collection = None
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
     def create(cls, course_id: str, title: str, drive_link: str, description: str = None):
         """Create a new note."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         
         note = {
             'course_id': course_id,
@@ -30,24 +48,26 @@ class Note:
         return note
     
     @classmethod
-    def find_by_course(cls, course_id):
-        """Find all notes for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return list(cls.get_collection().find({'course_id': course_id}).sort('created_at', -1))
+    def find_by_course(cls, course_id, projection: dict = None):
+        """Find all notes for a course, optionally limited to some fields."""
+        course_id = as_object_id(course_id)
+        return list(cls.get_collection().find({'course_id': course_id}, projection).sort('created_at', -1))
+    
+    @classmethod
+    def find_by_course_serialized(cls, course_id):
+        """Find all notes for a course, already JSON-ready."""
+        return cls.find_by_course(course_id, cls.SERIALIZED_PROJECTION)
     
     @classmethod
     def find_by_id(cls, note_id):
         """Find note by ID."""
-        if isinstance(note_id, str):
-            note_id = ObjectId(note_id)
+        note_id = as_object_id(note_id)
         return cls.get_collection().find_one({'_id': note_id})
     
     @classmethod
     def update(cls, note_id, data: dict):
         """Update note data."""
-        if isinstance(note_id, str):
-            note_id = ObjectId(note_id)
+        note_id = as_object_id(note_id)
         return cls.get_collection().update_one(
             {'_id': note_id},
             {'$set': data}
@@ -56,20 +76,17 @@ class Note:
     @classmethod
     def delete(cls, note_id):
         """Delete a note."""
-        if isinstance(note_id, str):
-            note_id = ObjectId(note_id)
+        note_id = as_object_id(note_id)
         return cls.get_collection().delete_one({'_id': note_id})
     
     @classmethod
     def delete_by_course(cls, course_id):
         """Delete all notes for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().delete_many({'course_id': course_id})
     
     @classmethod
     def count_by_course(cls, course_id):
         """Count notes for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().count_documents({'course_id': course_id})
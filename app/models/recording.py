@@ -1,6 +1,8 @@
 from datetime import datetime
-from bson import ObjectId
-from app import get_db
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app import bind_collection
+from app.models import as_object_id
 
 
 class Recording:
@@ -8,16 +10,47 @@ class Recording:
     
     collection_name = 'recordings'
     
+    indexes = [
+        IndexModel([('course_id', ASCENDING), ('recorded_at', ASCENDING)]),
+        # A Drive file is imported at most once per course; manual
+        # recordings without a file ID are left out of the index
+        IndexModel(
+            [('course_id', ASCENDING), ('drive_file_id', ASCENDING)],
+            unique=True,
+            partialFilterExpression={'drive_file_id': {'$gt': ''}}
+        )
+    ]
+    
+    # find() projection that returns recordings already JSON-ready
+    SERIALIZED_PROJECTION = {
+        '_id': {'$toString': '$_id'},
+        'course_id': {'$toString': '$course_id'},
+        'title': 1,
+        'drive_file_id': 1,
+        'drive_link': 1,
+        'duration': 1,
+        'recorded_at': {'$dateToString': {'date': '$recorded_at', 'format': '%Y-%m-%dT%H:%M:%S.%L000'}},
+        'created_at': {'$dateToString': {'date': '$created_at', 'format': '%Y-%m-%dT%H:%M:%S.%L000'}}
+    }
+    
+    _collection = None
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
     def create(cls, course_id, title: str, drive_file_id: str = None, 
                drive_link: str = None, duration: int = 0, recorded_at: datetime = None):
-        """Create a new recording entry."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        """Create a new recording entry.
+        
+        A Drive file the course already has is rejected by the unique index;
+        the existing recording is returned instead. Returns (recording, created).
+        """
+        course_id = as_object_id(course_id)
+        now = datetime.utcnow()
         
         recording = {
             'course_id': course_id,
@@ -25,51 +58,128 @@ class Recording:
             'drive_file_id': drive_file_id,
             'drive_link': drive_link,
             'duration': duration,
-            'recorded_at': recorded_at or datetime.utcnow(),
-            'created_at': datetime.utcnow()
+            'recorded_at': recorded_at or now,
+            'created_at': now
         }
-        result = cls.get_collection().insert_one(recording)
+        try:
+            result = cls.get_collection().insert_one(recording)
+        except DuplicateKeyError:
+            existing = cls.get_collection().find_one({'course_id': course_id, 'drive_file_id': drive_file_id})
+            return existing, False
         recording['_id'] = result.inserted_id
-        return recording
+        return recording, True
+    
+    @classmethod
+    def create_many(cls, course_id, recordings: list) -> list:
+        """Insert several recordings (dicts of create()'s fields) in one round trip.
+        
+        Drive files the course already has are skipped by the unique index;
+        only the recordings actually inserted are returned.
+        """
+        course_id = as_object_id(course_id)
+        now = datetime.utcnow()
+        
+        docs = [
+            {
+                'course_id': course_id,
+                'title': recording['title'],
+                'drive_file_id': recording.get('drive_file_id'),
+                'drive_link': recording.get('drive_link'),
+                'duration': recording.get('duration', 0),
+                'recorded_at': recording.get('recorded_at') or now,
+                'created_at': now
+            }
+            for recording in recordings
+        ]
+        if not docs:
+            return docs
+        try:
+            # insert_many sets _id on each dict in place
+            cls.get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details['writeErrors']
+            if any(error['code'] != 11000 for error in errors):
+                raise
+            duplicates = {error['index'] for error in errors}
+            docs = [doc for i, doc in enumerate(docs) if i not in duplicates]
+        return docs
     
     @classmethod
     def find_by_id(cls, recording_id):
         """Find recording by ID."""
-        if isinstance(recording_id, str):
-            recording_id = ObjectId(recording_id)
+        recording_id = as_object_id(recording_id)
         return cls.get_collection().find_one({'_id': recording_id})
     
     @classmethod
-    def find_by_course(cls, course_id):
-        """Get all recordings for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
-        return list(cls.get_collection().find({'course_id': course_id}).sort('recorded_at', 1))
+    def existing_drive_file_ids(cls, course_id, drive_file_ids) -> set:
+        """Return which of `drive_file_ids` are already recordings of the course."""
+        course_id = as_object_id(course_id)
+        # Repeating the partial index's filter lets the planner use it, and
+        # projecting only indexed fields makes this a covered query
+        cursor = cls.get_collection().find(
+            {'course_id': course_id, 'drive_file_id': {'$in': list(drive_file_ids), '$gt': ''}},
+            {'_id': 0, 'drive_file_id': 1}
+        )
+        return {recording['drive_file_id'] for recording in cursor}
+    
+    @classmethod
+    def iter_by_course(cls, course_id, batch_size: int = 100, projection: dict = None):
+        """Iterate a course's recordings lazily via a batched cursor."""
+        course_id = as_object_id(course_id)
+        return cls.get_collection().find(
+            {'course_id': course_id}, projection
+        ).sort('recorded_at', 1).batch_size(batch_size)
+    
+    @classmethod
+    def ids_by_courses(cls, course_ids) -> dict:
+        """Map each course ID to its recording IDs (as strings), in one grouped query.
+        
+        String IDs match the keys of an enrollment's progress map.
+        """
+        course_ids = [as_object_id(course_id) for course_id in course_ids]
+        if not course_ids:
+            return {}
+        groups = cls.get_collection().aggregate([
+            {'$match': {'course_id': {'$in': course_ids}}},
+            {'$group': {'_id': '$course_id', 'ids': {'$push': {'$toString': '$_id'}}}}
+        ])
+        return {group['_id']: group['ids'] for group in groups}
     
     @classmethod
     def update(cls, recording_id, data: dict):
         """Update recording."""
-        if isinstance(recording_id, str):
-            recording_id = ObjectId(recording_id)
+        recording_id = as_object_id(recording_id)
         return cls.get_collection().update_one({'_id': recording_id}, {'$set': data})
     
     @classmethod
     def count_by_course(cls, course_id) -> int:
         """Count recordings for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().count_documents({'course_id': course_id})
     
+    @classmethod
+    def count_by_courses(cls, course_ids) -> dict:
+        """Count recordings for several courses with one grouped query.
+        
+        Returns {course_id: count}; courses with none are absent.
+        """
+        course_ids = [as_object_id(course_id) for course_id in course_ids]
+        if not course_ids:
+            return {}
+        groups = cls.get_collection().aggregate([
+            {'$match': {'course_id': {'$in': course_ids}}},
+            {'$group': {'_id': '$course_id', 'n': {'$sum': 1}}}
+        ])
+        return {group['_id']: group['n'] for group in groups}
+    
     @classmethod
     def delete(cls, recording_id):
         """Delete a recording."""
-        if isinstance(recording_id, str):
-            recording_id = ObjectId(recording_id)
+        recording_id = as_object_id(recording_id)
         return cls.get_collection().delete_one({'_id': recording_id})
     
     @classmethod
     def delete_by_course(cls, course_id):
         """Delete all recordings for a course."""
-        if isinstance(course_id, str):
-            course_id = ObjectId(course_id)
+        course_id = as_object_id(course_id)
         return cls.get_collection().delete_many({'course_id': course_id})
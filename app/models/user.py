@@ -1,6 +1,8 @@
 from datetime import datetime
-from bson import ObjectId
-from app import get_db
+from pymongo import IndexModel, ReturnDocument
+from app import bind_collection
+from app.models import as_object_id
+from app.utils.cache import TTLCache
 
 
 class User:
@@ -8,9 +10,22 @@ class User:
     
     collection_name = 'users'
     
+    indexes = [
+        IndexModel('clerk_id', unique=True),
+        IndexModel('email')
+    ]
+    
+    _collection = None
+    
+    # Every authenticated request resolves the user by Clerk ID; keep them
+    # briefly. Writes through this model evict the entry.
+    _clerk_id_cache = TTLCache(maxsize=10000, ttl=30)
+    
     @classmethod
     def get_collection(cls):
-        return get_db()[cls.collection_name]
+        if cls._collection is None:
+            return bind_collection(cls)
+        return cls._collection
     
     @classmethod
     def create(cls, clerk_id: str, email: str, name: str, role: str = 'student', profile_image: str = None, verification_status: str = None):
@@ -29,18 +44,54 @@ class User:
         user['_id'] = result.inserted_id
         return user
     
+    @classmethod
+    def create_if_missing(cls, clerk_id: str, email: str, name: str, role: str = 'student'):
+        """Create a user unless one with this Clerk ID already exists.
+        
+        Idempotent, so redelivered webhooks (or a user already created by
+        set-role) are a cheap no-op instead of a duplicate-key error.
+        """
+        return cls.get_collection().update_one(
+            {'clerk_id': clerk_id},
+            {'$setOnInsert': {
+                'email': email,
+                'name': name,
+                'role': role,
+                'profile_image': None,
+                'google_tokens': None,
+                'verification_status': None,
+                'created_at': datetime.utcnow()
+            }},
+            upsert=True
+        )
+    
     @classmethod
     def find_by_clerk_id(cls, clerk_id: str):
-        """Find user by Clerk ID."""
-        return cls.get_collection().find_one({'clerk_id': clerk_id})
+        """Find user by Clerk ID.
+        
+        Cached per process for a few seconds; treat the result as read-only.
+        """
+        user = cls._clerk_id_cache.get(clerk_id)
+        if user is None:
+            user = cls.get_collection().find_one({'clerk_id': clerk_id})
+            if user:
+                cls._clerk_id_cache.set(clerk_id, user)
+        return user
     
     @classmethod
     def find_by_id(cls, user_id):
         """Find user by MongoDB ID."""
-        if isinstance(user_id, str):
-            user_id = ObjectId(user_id)
+        user_id = as_object_id(user_id)
         return cls.get_collection().find_one({'_id': user_id})
     
+    @classmethod
+    def find_by_ids(cls, user_ids, projection: dict = None) -> dict:
+        """Fetch several users with one $in query, keyed by _id."""
+        user_ids = list({as_object_id(user_id) for user_id in user_ids})
+        if not user_ids:
+            return {}
+        return {user['_id']: user for user in cls.get_collection().find({'_id': {'$in': user_ids}}, projection)}
+    
     @classmethod
     def find_by_email(cls, email: str):
         """Find user by email."""
@@ -49,10 +100,62 @@ class User:
     @classmethod
     def update(cls, clerk_id: str, data: dict):
         """Update user data."""
-        return cls.get_collection().update_one(
+        result = cls.get_collection().update_one(
             {'clerk_id': clerk_id},
             {'$set': data}
         )
+        cls._clerk_id_cache.delete(clerk_id)
+        if 'name' in data and result.modified_count:
+            # Keep the instructor name copied onto courses in sync
+            from app.models.course import Course
+            user = cls.get_collection().find_one({'clerk_id': clerk_id}, {'_id': 1})
+            if user:
+                Course.set_instructor_name(user['_id'], data['name'])
+        return result
+    
+    @classmethod
+    def upsert_role(cls, clerk_id: str, role: str, email: str = '', name: str = 'User', profile_image: str = None):
+        """Set a user's role, creating the user if needed, in one round trip.
+        
+        Existing profile fields are only filled in when blank, and an
+        approved instructor stays approved. Returns the updated user.
+        """
+        if role == 'instructor':
+            # Instructors need approval unless already approved
+            verification_status = {'$cond': [
+                {'$eq': ['$verification_status', 'approved']}, 'approved', 'pending'
+            ]}
+        else:
+            verification_status = {'$ifNull': ['$verification_status', None]}
+        
+        # Pipeline update: expressions see the stored document (or only the
+        # filter fields on insert). User input is wrapped in $literal.
+        update = [{'$set': {
+            'role': {'$literal': role},
+            'verification_status': verification_status,
+            'email': {'$cond': [
+                {'$eq': [{'$ifNull': ['$email', '']}, '']},
+                {'$literal': email or ''},
+                '$email'
+            ]},
+            'name': {'$cond': [
+                {'$eq': [{'$ifNull': ['$name', 'User']}, 'User']},
+                {'$literal': name},
+                '$name'
+            ]},
+            'profile_image': {'$ifNull': ['$profile_image', {'$literal': profile_image}]},
+            'google_tokens': {'$ifNull': ['$google_tokens', None]},
+            'created_at': {'$ifNull': ['$created_at', datetime.utcnow()]}
+        }}]
+        # Concurrent upserts on the unique clerk_id index are retried by the server
+        user = cls.get_collection().find_one_and_update(
+            {'clerk_id': clerk_id},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        cls._clerk_id_cache.delete(clerk_id)
+        return user
     
     @classmethod
     def update_google_tokens(cls, clerk_id: str, tokens: dict):
@@ -67,4 +170,6 @@ class User:
     @classmethod
     def delete(cls, clerk_id: str):
         """Delete user."""
-        return cls.get_collection().delete_one({'clerk_id': clerk_id})
+        result = cls.get_collection().delete_one({'clerk_id': clerk_id})
+        cls._clerk_id_cache.delete(clerk_id)
+        return result
@@ -1,14 +1,14 @@
 import os
 import json
+import requests
 from flask import Blueprint, request, jsonify, redirect, url_for, session
-from google_auth_oauthlib.flow import Flow
-from svix.webhooks import Webhook, WebhookVerificationError
 from app.config import Config
 from app.models.user import User
 from app.utils.validators import validate_clerk_user_id, sanitize_string, validate_email
+from app.utils.clerk import verify_webhook, WebhookVerificationError
 
 # Only allow OAuth over HTTP in development (controlled by environment)
-if os.getenv('FLASK_ENV') == 'development':
+if Config.FLASK_ENV == 'development':
     os.environ['OAUTHLIB_INSECURE_TRANSPORT'] = '1'
 
 # Relax scope validation as Google often adds openid/userinfo
@@ -16,18 +16,39 @@ os.environ['OAUTHLIB_RELAX_TOKEN_SCOPE'] = '1'
 
 auth_bp = Blueprint('auth', __name__)
 
+# Same endpoint the oauth2 v2 discovery client calls, without the discovery fetch
+GOOGLE_USERINFO_URL = 'https://www.googleapis.com/oauth2/v2/userinfo'
+
+# Pooled HTTP session so repeat logins reuse the TLS connection to Google
+_http = requests.Session()
+
+# OAuth client config shared by both Flow constructions (read-only)
+_GOOGLE_CLIENT_CONFIG = {
+    'web': {
+        'client_id': Config.GOOGLE_CLIENT_ID,
+        'client_secret': Config.GOOGLE_CLIENT_SECRET,
+        'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+        'redirect_uris': [Config.GOOGLE_REDIRECT_URI]
+    }
+}
+
 
 @auth_bp.route('/clerk/webhook', methods=['POST'])
 def clerk_webhook():
     """Handle Clerk webhook events for user sync."""
     payload = request.get_data()
-    headers = dict(request.headers)
+    # Only the three Svix headers are needed for verification
+    headers = {
+        'svix-id': request.headers.get('svix-id', ''),
+        'svix-timestamp': request.headers.get('svix-timestamp', ''),
+        'svix-signature': request.headers.get('svix-signature', '')
+    }
     
     # Verify webhook signature
     if Config.CLERK_WEBHOOK_SECRET:
         try:
-            wh = Webhook(Config.CLERK_WEBHOOK_SECRET)
-            msg = wh.verify(payload, headers)
+            msg = verify_webhook(payload, headers)
         except WebhookVerificationError:
             return jsonify({'error': 'Invalid signature'}), 401
     else:
@@ -36,9 +57,10 @@ def clerk_webhook():
     event_type = msg.get('type')
     data = msg.get('data', {})
     
+    # Handlers are idempotent: Svix redelivers on timeouts/errors
     if event_type == 'user.created':
         # Create user in our database
-        User.create(
+        User.create_if_missing(
             clerk_id=data.get('id'),
             email=data.get('email_addresses', [{}])[0].get('email_address', ''),
             name=f"{data.get('first_name', '')} {data.get('last_name', '')}".strip(),
@@ -65,6 +87,8 @@ def clerk_webhook():
 @auth_bp.route('/google')
 def google_auth():
     """Start Google OAuth flow."""
+    from google_auth_oauthlib.flow import Flow
+    
     # Store Clerk user ID in session (passed as query param from frontend)
     clerk_user_id = request.args.get('clerk_user_id')
     if clerk_user_id:
@@ -74,15 +98,7 @@ def google_auth():
         session['pending_clerk_user_id'] = clerk_user_id
     
     flow = Flow.from_client_config(
-        {
-            'web': {
-                'client_id': Config.GOOGLE_CLIENT_ID,
-                'client_secret': Config.GOOGLE_CLIENT_SECRET,
-                'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
-                'token_uri': 'https://oauth2.googleapis.com/token',
-                'redirect_uris': [Config.GOOGLE_REDIRECT_URI]
-            }
-        },
+        _GOOGLE_CLIENT_CONFIG,
         scopes=Config.GOOGLE_SCOPES
     )
     flow.redirect_uri = Config.GOOGLE_REDIRECT_URI
@@ -100,16 +116,10 @@ def google_auth():
 @auth_bp.route('/google/callback')
 def google_callback():
     """Handle Google OAuth callback."""
+    from google_auth_oauthlib.flow import Flow
+    
     flow = Flow.from_client_config(
-        {
-            'web': {
-                'client_id': Config.GOOGLE_CLIENT_ID,
-                'client_secret': Config.GOOGLE_CLIENT_SECRET,
-                'auth_uri': 'https://accounts.google.com/o/oauth2/auth',
-                'token_uri': 'https://oauth2.googleapis.com/token',
-                'redirect_uris': [Config.GOOGLE_REDIRECT_URI]
-            }
-        },
+        _GOOGLE_CLIENT_CONFIG,
         scopes=Config.GOOGLE_SCOPES,
         state=session.get('google_oauth_state')
     )
@@ -128,10 +138,17 @@ def google_callback():
     credentials = flow.credentials
     
     # Fetch the Google user's email to show which account is connected
-    from googleapiclient.discovery import build
-    oauth2_service = build('oauth2', 'v2', credentials=credentials)
-    user_info = oauth2_service.userinfo().get().execute()
-    google_email = user_info.get('email', '')
+    google_email = ''
+    try:
+        response = _http.get(
+            GOOGLE_USERINFO_URL,
+            headers={'Authorization': f'Bearer {credentials.token}'},
+            timeout=5
+        )
+        if response.ok:
+            google_email = response.json().get('email', '')
+    except requests.RequestException as e:
+        print(f"Error fetching Google user info: {e}")
     
     tokens = {
         'access_token': credentials.token,
@@ -145,9 +162,11 @@ def google_callback():
     clerk_user_id = session.pop('pending_clerk_user_id', None)
     if clerk_user_id:
         User.update_google_tokens(clerk_user_id, tokens)
-    
-    # Also store in session for immediate use
-    session['google_tokens'] = tokens
+        # Persisted on the user; don't keep a second copy in the session
+        session.pop('google_tokens', None)
+    else:
+        # Keep in session for immediate use
+        session['google_tokens'] = tokens
     
     return redirect('/dashboard/instructor')
 
@@ -155,7 +174,7 @@ def google_callback():
 @auth_bp.route('/set-role', methods=['POST'])
 def set_role():
     """Set user role (for initial setup). Creates user if not exists."""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     clerk_user_id = data.get('clerk_user_id')
     role = data.get('role')
     email = data.get('email', '')
@@ -174,52 +193,25 @@ def set_role():
     name = sanitize_string(name, max_length=100) or 'User'
     if profile_image:
         # Simple URL validation for profile image
-        if not profile_image.startswith(('https://', 'http://')):
+        if not isinstance(profile_image, str) or not profile_image.startswith(('https://', 'http://')):
             profile_image = None
     
-    # Check if user exists
-    user = User.find_by_clerk_id(clerk_user_id)
-    
-    # Determine verification status for instructors
-    verification_status = None
-    if role == 'instructor':
-        verification_status = 'pending'  # Instructors need approval
-    
-    if user:
-        # Update existing user's role and profile info if missing
-        update_data = {'role': role}
-        if role == 'instructor':
-            # Only set to pending if not already approved
-            if user.get('verification_status') != 'approved':
-                update_data['verification_status'] = 'pending'
-            else:
-                verification_status = 'approved'  # Keep approved status
-        if email and not user.get('email'):
-            update_data['email'] = email
-        if name and name != 'User' and user.get('name') == 'User':
-            update_data['name'] = name
-        if profile_image and not user.get('profile_image'):
-            update_data['profile_image'] = profile_image
-        User.update(clerk_user_id, update_data)
-        verification_status = update_data.get('verification_status', user.get('verification_status'))
-    else:
-        # Create new user with role
-        User.create(
-            clerk_id=clerk_user_id,
-            email=email,
-            name=name,
-            role=role,
-            profile_image=profile_image,
-            verification_status=verification_status
-        )
+    # Create the user or update role and missing profile info atomically
+    user = User.upsert_role(
+        clerk_user_id,
+        role,
+        email=email,
+        name=name,
+        profile_image=profile_image
+    )
     
-    return jsonify({'success': True, 'role': role, 'verification_status': verification_status})
+    return jsonify({'success': True, 'role': role, 'verification_status': user.get('verification_status')})
 
 
 @auth_bp.route('/sync-profile', methods=['POST'])
 def sync_profile():
     """Sync user profile data from Clerk. Updates name, email, profile_image."""
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     clerk_user_id = data.get('clerk_user_id')
     email = data.get('email')
     name = data.get('name')
@@ -238,7 +230,7 @@ def sync_profile():
         update_data['email'] = email
     if name and name != 'User':
         update_data['name'] = sanitize_string(name, max_length=100)
-    if profile_image and profile_image.startswith(('https://', 'http://')):
+    if isinstance(profile_image, str) and profile_image.startswith(('https://', 'http://')):
         update_data['profile_image'] = profile_image
     
     if update_data:
@@ -1,32 +1,52 @@
-from flask import Blueprint, request, jsonify, g, render_template, send_file
+from flask import Blueprint, request, jsonify, g, render_template, send_file, current_app
 from datetime import datetime
 import re
+import secrets
 from app.models.certificate import Certificate
 from app.models.enrollment import Enrollment
 from app.models.course import Course
 from app.models.user import User
+from app import limiter
 from app.utils.clerk import require_auth, require_instructor
-from app.services.certificate_generator import CertificateGenerator
-from app.utils.validators import validate_object_id, sanitize_string
+from app.utils.validators import sanitize_string
+from app.utils.responses import stream_json_list
 
 certificates_bp = Blueprint('certificates', __name__)
 
+# Renders never change for a given certificate code; clients and the CDN
+# keep them, so the server doesn't hold rendered bytes itself
+RENDER_MAX_AGE = 365 * 24 * 3600
+
+# Public code lookups are throttled per client IP to stop code enumeration
+PUBLIC_LOOKUP_LIMIT = '30/minute'
+
+# Certificate codes are typically alphanumeric, 8-32 characters
+_CERT_CODE_RE = re.compile(r'[A-Z0-9-]{8,32}')
+
+
+def _serialize_certificate(certificate):
+    """Copy of a certificate with ObjectId/datetime fields made JSON-ready."""
+    return dict(
+        certificate,
+        _id=str(certificate['_id']),
+        student_id=str(certificate['student_id']),
+        course_id=str(certificate['course_id']),
+        issued_at=certificate['issued_at'].isoformat()
+    )
+
 
 def validate_certificate_code(code):
     """Validate certificate code format."""
     if not code or not isinstance(code, str):
         return False
-    # Certificate codes are typically alphanumeric, 8-32 characters
-    return bool(re.match(r'^[A-Z0-9-]{8,32}$', code.upper()))
+    # Issued codes are already uppercase; only copy the string if needed
+    return bool(_CERT_CODE_RE.fullmatch(code) or _CERT_CODE_RE.fullmatch(code.upper()))
 
 
-@certificates_bp.route('/api/courses/<course_id>/toggle-attendance', methods=['POST'])
+@certificates_bp.route('/api/courses/<oid:course_id>/toggle-attendance', methods=['POST'])
 @require_instructor
 def toggle_attendance(course_id):
     """Toggle attendance mode for a course (instructor only)."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
     course = Course.find_by_id(course_id)
     if not course:
         return jsonify({'error': 'Course not found'}), 404
@@ -40,8 +60,8 @@ def toggle_attendance(course_id):
     # Generate a unique class_id for this attendance session if activating
     update_data = {'attendance_active': new_status}
     if new_status:
-        # Create a unique class ID based on timestamp
-        class_id = f"class_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        # Random class ID: second-resolution timestamps collided on quick re-toggles
+        class_id = f"class_{secrets.token_urlsafe(9)}"
         update_data['current_class_id'] = class_id
     else:
         update_data['current_class_id'] = None
@@ -54,14 +74,11 @@ def toggle_attendance(course_id):
     })
 
 
-@certificates_bp.route('/api/courses/<course_id>/attendance-status')
+@certificates_bp.route('/api/courses/<oid:course_id>/attendance-status')
 @require_auth
 def attendance_status(course_id):
     """Check if attendance is active for a course."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
-    course = Course.find_by_id(course_id)
+    course = Course.find_by_id(course_id, {'attendance_active': 1, 'current_class_id': 1})
     if not course:
         return jsonify({'error': 'Course not found'}), 404
     
@@ -71,44 +88,36 @@ def attendance_status(course_id):
     })
 
 
-@certificates_bp.route('/api/courses/<course_id>/mark-attendance', methods=['POST'])
+@certificates_bp.route('/api/courses/<oid:course_id>/mark-attendance', methods=['POST'])
 @require_auth
 def mark_attendance(course_id):
     """Mark attendance for current user (student)."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
-    course = Course.find_by_id(course_id)
+    course = Course.find_by_id(course_id, {'attendance_active': 1, 'current_class_id': 1})
     if not course:
         return jsonify({'error': 'Course not found'}), 404
     
     if not course.get('attendance_active'):
         return jsonify({'error': 'Attendance is not active'}), 400
     
-    # Check if user is enrolled
-    if not Enrollment.is_enrolled(g.current_user['_id'], course_id):
-        return jsonify({'error': 'Not enrolled in this course'}), 403
-    
     class_id = course.get('current_class_id')
     if not class_id:
         return jsonify({'error': 'No active class session'}), 400
     
-    # Mark attendance
+    # Mark attendance; the update itself reports whether the user is enrolled
     marked = Enrollment.mark_attendance(g.current_user['_id'], course_id, class_id)
     
+    if marked is None:
+        return jsonify({'error': 'Not enrolled in this course'}), 403
     if marked:
         return jsonify({'success': True, 'message': 'Attendance marked!'})
     else:
         return jsonify({'success': False, 'message': 'Already marked attendance for this class'})
 
 
-@certificates_bp.route('/api/courses/<course_id>/my-attendance')
+@certificates_bp.route('/api/courses/<oid:course_id>/my-attendance')
 @require_auth
 def my_attendance(course_id):
     """Get current user's attendance for a course."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
     enrollment = Enrollment.find_one(g.current_user['_id'], course_id)
     if not enrollment:
         return jsonify({'error': 'Not enrolled'}), 404
@@ -119,14 +128,16 @@ def my_attendance(course_id):
     })
 
 
-@certificates_bp.route('/api/courses/<course_id>/generate-certificate', methods=['POST'])
+@certificates_bp.route('/api/courses/<oid:course_id>/generate-certificate', methods=['POST'])
 @require_auth
 def generate_certificate(course_id):
     """Generate certificate for a completed course."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
-    course = Course.find_by_id(course_id)
+    # Completed classes are counted server-side, same rule as the course detail page
+    course = Course.find_with_completed_count(
+        course_id,
+        {'title': 1, 'instructor_id': 1, 'instructor_name': 1, 'is_completed': 1},
+        datetime.utcnow()
+    )
     if not course:
         return jsonify({'error': 'Course not found'}), 404
     
@@ -139,15 +150,6 @@ def generate_certificate(course_id):
     if not enrollment:
         return jsonify({'error': 'Not enrolled in this course'}), 403
     
-    # Check if certificate already exists
-    existing = Certificate.find_by_student_and_course(g.current_user['_id'], course_id)
-    if existing:
-        existing['_id'] = str(existing['_id'])
-        existing['student_id'] = str(existing['student_id'])
-        existing['course_id'] = str(existing['course_id'])
-        existing['issued_at'] = existing['issued_at'].isoformat()
-        return jsonify(existing)
-    
     # Get custom student name from request body if provided
     student_name = g.current_user['name']  # Default to user's name
     try:
@@ -162,31 +164,29 @@ def generate_certificate(course_id):
     # Calculate attendance
     attendance_count = enrollment.get('attendance_count', 0)
     
-    # Count completed classes - same logic as course detail page
-    from datetime import timezone
-    now_utc = datetime.now(timezone.utc)
-    total_classes = 0
-    for scheduled in course.get('scheduled_classes', []):
-        scheduled_dt = scheduled.get('datetime')
-        if scheduled_dt:
-            # Ensure scheduled_dt is timezone-aware (assume UTC if naive)
-            if scheduled_dt.tzinfo is None:
-                scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
-            # Check if manually marked as completed OR time has passed
-            if scheduled.get('is_completed') or scheduled_dt <= now_utc:
-                total_classes += 1
+    total_classes = course['completed_classes']
     
     if total_classes == 0:
+        # Classes may have been deleted after the certificate was issued
+        certificate = Certificate.find_by_student_and_course(g.current_user['_id'], course_id)
+        if certificate:
+            return jsonify(_serialize_certificate(certificate))
         return jsonify({'error': 'No classes have been completed'}), 400
     
     attendance_percentage = round((attendance_count / total_classes) * 100, 1) if total_classes > 0 else 0
     
-    # Get instructor name
-    instructor = User.find_by_id(course['instructor_id'])
-    instructor_name = instructor['name'] if instructor else 'Instructor'
-    
-    # Create certificate
-    certificate = Certificate.create(
+    # Instructor name is denormalized onto the course; backfill older courses
+    instructor_name = course.get('instructor_name')
+    if not instructor_name:
+        instructor = User.find_by_id(course['instructor_id'])
+        if instructor:
+            instructor_name = instructor['name']
+            Course.set_instructor_name(course['instructor_id'], instructor_name)
+        else:
+            instructor_name = 'Instructor'
+    
+    # Create certificate; an already-issued one is returned as-is (unique index)
+    certificate, created = Certificate.create(
         student_id=g.current_user['_id'],
         course_id=course_id,
         student_name=student_name,
@@ -197,34 +197,25 @@ def generate_certificate(course_id):
         attendance_percentage=attendance_percentage
     )
     
-    certificate['_id'] = str(certificate['_id'])
-    certificate['student_id'] = str(certificate['student_id'])
-    certificate['course_id'] = str(certificate['course_id'])
-    certificate['issued_at'] = certificate['issued_at'].isoformat()
-    
-    return jsonify(certificate), 201
+    return jsonify(_serialize_certificate(certificate)), 201 if created else 200
 
 
-@certificates_bp.route('/api/courses/<course_id>/certificate')
+@certificates_bp.route('/api/courses/<oid:course_id>/certificate')
 @require_auth
 def get_certificate(course_id):
     """Get certificate for current user and course."""
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID format'}), 400
-    
-    certificate = Certificate.find_by_student_and_course(g.current_user['_id'], course_id)
+    # Projection returns the document already JSON-ready
+    certificate = Certificate.find_by_student_and_course(
+        g.current_user['_id'], course_id, Certificate.SERIALIZED_PROJECTION
+    )
     if not certificate:
         return jsonify({'error': 'Certificate not found'}), 404
     
-    certificate['_id'] = str(certificate['_id'])
-    certificate['student_id'] = str(certificate['student_id'])
-    certificate['course_id'] = str(certificate['course_id'])
-    certificate['issued_at'] = certificate['issued_at'].isoformat()
-    
     return jsonify(certificate)
 
 
 @certificates_bp.route('/api/certificates/verify/<code>')
+@limiter.limit(PUBLIC_LOOKUP_LIMIT)
 def verify_certificate(code):
     """Verify a certificate by code (public endpoint)."""
     if not validate_certificate_code(code):
@@ -251,20 +242,40 @@ def verify_certificate(code):
 @require_auth
 def my_certificates():
     """Get all certificates for current user."""
-    certificates = Certificate.find_by_student(g.current_user['_id'])
-    
-    result = []
-    for cert in certificates:
-        cert['_id'] = str(cert['_id'])
-        cert['student_id'] = str(cert['student_id'])
-        cert['course_id'] = str(cert['course_id'])
-        cert['issued_at'] = cert['issued_at'].isoformat()
-        result.append(cert)
+    # Fields are stringified by the projection; stream straight from the cursor
+    return stream_json_list(Certificate.iter_by_student_serialized(g.current_user['_id']))
+
+
+def _render_certificate(certificate, fmt):
+    """Render a certificate ('png' or 'pdf') into a BytesIO buffer."""
+    from app.services.certificate_generator import CertificateGenerator
     
-    return jsonify(result)
+    render = (CertificateGenerator.generate_certificate_image if fmt == 'png'
+              else CertificateGenerator.generate_certificate_pdf)
+    return render(
+        student_name=certificate['student_name'],
+        course_title=certificate['course_title'],
+        instructor_name=certificate['instructor_name'],
+        certificate_code=certificate['certificate_code'],
+        attendance_count=certificate['attendance_count'],
+        total_classes=certificate['total_classes'],
+        attendance_percentage=certificate['attendance_percentage'],
+        issued_date=certificate['issued_at']
+    )
+
+
+def _not_modified(etag):
+    """304 for a client revalidating a render it already has, without re-rendering."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = RENDER_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 
 @certificates_bp.route('/api/certificates/<code>/image')
+@limiter.limit(PUBLIC_LOOKUP_LIMIT)
 def certificate_image(code):
     """Generate and return certificate as PNG image."""
     if not validate_certificate_code(code):
@@ -274,26 +285,24 @@ def certificate_image(code):
     if not certificate:
         return jsonify({'error': 'Certificate not found'}), 404
     
-    img_buffer = CertificateGenerator.generate_certificate_image(
-        student_name=certificate['student_name'],
-        course_title=certificate['course_title'],
-        instructor_name=certificate['instructor_name'],
-        certificate_code=certificate['certificate_code'],
-        attendance_count=certificate['attendance_count'],
-        total_classes=certificate['total_classes'],
-        attendance_percentage=certificate['attendance_percentage'],
-        issued_date=certificate['issued_at']
-    )
+    etag = f"png-{certificate['certificate_code']}"
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
     
-    return send_file(
-        img_buffer,
+    response = send_file(
+        _render_certificate(certificate, 'png'),
         mimetype='image/png',
         as_attachment=False,
-        download_name=f"certificate_{code}.png"
+        download_name=f"certificate_{code}.png",
+        etag=etag,
+        max_age=RENDER_MAX_AGE
     )
+    response.cache_control.immutable = True
+    return response
 
 
 @certificates_bp.route('/api/certificates/<code>/download')
+@limiter.limit(PUBLIC_LOOKUP_LIMIT)
 def certificate_download(code):
     """Generate and download certificate as PDF."""
     if not validate_certificate_code(code):
@@ -303,28 +312,25 @@ def certificate_download(code):
     if not certificate:
         return jsonify({'error': 'Certificate not found'}), 404
     
-    pdf_buffer = CertificateGenerator.generate_certificate_pdf(
-        student_name=certificate['student_name'],
-        course_title=certificate['course_title'],
-        instructor_name=certificate['instructor_name'],
-        certificate_code=certificate['certificate_code'],
-        attendance_count=certificate['attendance_count'],
-        total_classes=certificate['total_classes'],
-        attendance_percentage=certificate['attendance_percentage'],
-        issued_date=certificate['issued_at']
-    )
-    
     # Create a safe filename
     safe_name = certificate['student_name'].replace(' ', '_')
     safe_course = certificate['course_title'].replace(' ', '_')[:30]
     filename = f"Certificate_{safe_name}_{safe_course}.pdf"
     
-    return send_file(
-        pdf_buffer,
+    etag = f"pdf-{certificate['certificate_code']}"
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
+    response = send_file(
+        _render_certificate(certificate, 'pdf'),
         mimetype='application/pdf',
         as_attachment=True,
-        download_name=filename
+        download_name=filename,
+        etag=etag,
+        max_age=RENDER_MAX_AGE
     )
+    response.cache_control.immutable = True
+    return response
 
 
 @certificates_bp.route('/verify')
@@ -1,87 +1,75 @@
 from flask import Blueprint, render_template, request, jsonify, g
 from bson import ObjectId
-from bson.errors import InvalidId
 from datetime import datetime
+from functools import partial
 from app.models.course import Course
-from app.models.recording import Recording
 from app.models.enrollment import Enrollment
-from app.models.note import Note
 from app.models.user import User
 from app.utils.clerk import require_auth, require_instructor
-from app.utils.validators import sanitize_string, validate_url, validate_price, validate_object_id
-from app.services.google_meet import GoogleMeetService
+from app.utils.parallel import run_parallel
+from app.utils.responses import to_jsonable
+from app.utils.validators import sanitize_string, validate_url, validate_price
 
 courses_bp = Blueprint('courses', __name__)
 
 
+def _owned_course(course_id, projection: dict = None):
+    """Fetch a course owned by the current instructor.
+    
+    Only `instructor_id` plus the fields in `projection` are loaded.
+    Returns (course, None), or (None, error_response) when the course is
+    missing or belongs to someone else.
+    """
+    course = Course.find_by_id(course_id, dict(projection or {}, instructor_id=1))
+    if not course:
+        return None, (jsonify({'error': 'Course not found'}), 404)
+    
+    if course['instructor_id'] != g.current_user['_id']:
+        return None, (jsonify({'error': 'Not authorized'}), 403)
+    
+    return course, None
+
+
 @courses_bp.route('/courses')
 def list_courses():
     """List all published courses."""
-    courses = Course.find_all_published()
-    
-    # Add instructor info and stats to each course
-    for course in courses:
-        instructor = User.find_by_id(course['instructor_id'])
-        course['instructor'] = instructor
-        course['student_count'] = Enrollment.count_by_course(course['_id'])
+    # Instructor and student count are joined in by the aggregation
+    courses = Course.find_published_with_stats()
     
     return render_template('courses/list.html', courses=courses)
 
 
-@courses_bp.route('/courses/<course_id>')
+@courses_bp.route('/courses/<oid:course_id>')
 def course_detail(course_id):
     """View course details."""
-    # Validate course_id format to prevent injection
-    if not validate_object_id(course_id):
-        return render_template('errors/404.html'), 404
+    clerk_user_id = request.headers.get('X-Clerk-User-Id')
     
-    try:
-        course = Course.find_by_id(course_id)
-    except InvalidId:
-        return render_template('errors/404.html'), 404
+    def check_enrolled():
+        """Check if current user is enrolled (if logged in)."""
+        if clerk_user_id:
+            user = User.find_by_clerk_id(clerk_user_id)
+            if user:
+                return Enrollment.is_enrolled(user['_id'], course_id)
+        return False
+    
+    # Independent reads run concurrently; scheduled classes come back
+    # already split into upcoming/completed
+    course, student_count, is_enrolled = run_parallel(
+        lambda: Course.find_with_class_split(course_id, datetime.utcnow()),
+        lambda: Enrollment.count_by_course(course_id),
+        check_enrolled
+    )
     
     if not course:
         return render_template('errors/404.html'), 404
     
     instructor = User.find_by_id(course['instructor_id'])
-    recordings = Recording.find_by_course(course_id)
-    student_count = Enrollment.count_by_course(course_id)
-    
-    # Separate scheduled classes into upcoming and completed
-    # Always use UTC for consistent comparison
-    from datetime import timezone
-    now_utc = datetime.now(timezone.utc)
-    upcoming_classes = []
-    completed_classes = []
-    for scheduled in course.get('scheduled_classes', []):
-        scheduled_dt = scheduled.get('datetime')
-        if scheduled_dt:
-            # Ensure scheduled_dt is timezone-aware (assume UTC if naive)
-            if scheduled_dt.tzinfo is None:
-                scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
-            # Check if manually marked as completed OR time has passed
-            if scheduled.get('is_completed') or scheduled_dt <= now_utc:
-                completed_classes.append(scheduled)
-            else:
-                upcoming_classes.append(scheduled)
-    
-    # Store both lists in course object for template
-    course['upcoming_classes'] = upcoming_classes
-    course['completed_classes'] = completed_classes
-    
-    # Check if current user is enrolled (if logged in)
-    is_enrolled = False
-    clerk_user_id = request.headers.get('X-Clerk-User-Id')
-    if clerk_user_id:
-        user = User.find_by_clerk_id(clerk_user_id)
-        if user:
-            is_enrolled = Enrollment.is_enrolled(user['_id'], course_id)
     
+    # Recordings are fetched client-side from the recordings API
     return render_template(
         'courses/detail.html',
         course=course,
         instructor=instructor,
-        recordings=recordings,
         student_count=student_count,
         is_enrolled=is_enrolled
     )
@@ -116,26 +104,20 @@ def create_course():
         description=description,
         instructor_id=g.current_user['_id'],
         thumbnail=thumbnail,
-        price=price
+        price=price,
+        instructor_name=g.current_user['name']
     )
     
-    course['_id'] = str(course['_id'])
-    course['instructor_id'] = str(course['instructor_id'])
-    
-    return jsonify(course), 201
+    return jsonify(to_jsonable(course)), 201
 
 
-@courses_bp.route('/api/courses/<course_id>', methods=['PUT'])
+@courses_bp.route('/api/courses/<oid:course_id>', methods=['PUT'])
 @require_instructor
 def update_course(course_id):
     """Update a course."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    # Check ownership
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
+    course, error = _owned_course(course_id)
+    if error:
+        return error
     
     data = request.get_json()
     update_data = {}
@@ -158,58 +140,41 @@ def update_course(course_id):
     return jsonify({'success': True})
 
 
-@courses_bp.route('/api/courses/<course_id>', methods=['DELETE'])
+@courses_bp.route('/api/courses/<oid:course_id>', methods=['DELETE'])
 @require_instructor
 def delete_course(course_id):
     """Delete a course."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    # Check ownership
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
+    course, error = _owned_course(course_id)
+    if error:
+        return error
     
-    # Delete associated recordings
-    Recording.delete_by_course(course_id)
-    
-    # Delete associated notes
-    Note.delete_by_course(course_id)
-    
-    # Delete associated enrollments
-    Enrollment.delete_by_course(course_id)
-    
-    # Delete course
-    Course.delete(course_id)
+    # Delete course with its recordings, notes and enrollments
+    Course.delete_cascade(course_id)
     
     return jsonify({'success': True})
 
 
-@courses_bp.route('/api/courses/<course_id>/publish', methods=['POST'])
+@courses_bp.route('/api/courses/<oid:course_id>/publish', methods=['POST'])
 @require_instructor
 def publish_course(course_id):
     """Publish a course."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
+    course, error = _owned_course(course_id)
+    if error:
+        return error
     
     Course.publish(course_id)
     return jsonify({'success': True})
 
 
-@courses_bp.route('/api/courses/<course_id>/schedule-class', methods=['POST'])
+@courses_bp.route('/api/courses/<oid:course_id>/schedule-class', methods=['POST'])
 @require_instructor
 def schedule_class(course_id):
     """Schedule a new class with Google Meet."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
+    from app.services.google_meet import GoogleMeetService
     
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
+    course, error = _owned_course(course_id, {'title': 1})
+    if error:
+        return error
     
     # Check if user has Google tokens
     if not g.current_user.get('google_tokens'):
@@ -218,18 +183,21 @@ def schedule_class(course_id):
     data = request.get_json()
     
     try:
-        meet_service = GoogleMeetService(g.current_user['google_tokens'])
+        meet_service = GoogleMeetService(
+            g.current_user['google_tokens'],
+            on_refresh=partial(User.update_google_tokens, g.current_user['clerk_id'])
+        )
         
         # Parse datetime
         start_time = datetime.fromisoformat(data.get('datetime'))
         
         # Get enrolled student emails (filter out empty/invalid emails)
         enrollments = Enrollment.find_by_course(course_id)
-        attendee_emails = []
-        for enrollment in enrollments:
-            student = User.find_by_id(enrollment['student_id'])
-            if student and student.get('email') and '@' in student.get('email', ''):
-                attendee_emails.append(student['email'])
+        students = User.find_by_ids([e['student_id'] for e in enrollments], {'email': 1})
+        attendee_emails = [
+            student['email'] for student in students.values()
+            if student.get('email') and '@' in student['email']
+        ]
         
         # Create Meet event
         result = meet_service.create_meet_event(
@@ -255,53 +223,41 @@ def schedule_class(course_id):
         return jsonify({'error': str(e)}), 500
 
 
-@courses_bp.route('/api/courses/<course_id>/mark-class-completed', methods=['POST'])
+@courses_bp.route('/api/courses/<oid:course_id>/mark-class-completed', methods=['POST'])
 @require_instructor
 def mark_class_completed(course_id):
     """Mark a scheduled class as completed manually."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     event_id = data.get('event_id')
     
     if not event_id:
         return jsonify({'error': 'Event ID required'}), 400
     
-    # Update the specific class to mark it as completed
-    result = Course.mark_class_completed(course_id, event_id)
+    # Ownership is part of the update filter; only look the course up on a miss
+    result = Course.mark_class_completed(course_id, event_id, g.current_user['_id'])
     
     if result.modified_count > 0:
         return jsonify({'success': True})
-    else:
-        return jsonify({'error': 'Class not found'}), 404
+    
+    _, error = _owned_course(course_id, {'_id': 1})
+    return error or (jsonify({'error': 'Class not found'}), 404)
 
 
-@courses_bp.route('/api/courses/<course_id>/delete-scheduled-class', methods=['POST'])
+@courses_bp.route('/api/courses/<oid:course_id>/delete-scheduled-class', methods=['POST'])
 @require_instructor
 def delete_scheduled_class(course_id):
     """Delete a scheduled class."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     event_id = data.get('event_id')
     
     if not event_id:
         return jsonify({'error': 'Event ID required'}), 400
     
-    # Remove the scheduled class
-    result = Course.remove_scheduled_class(course_id, event_id)
+    # Ownership is part of the update filter; only look the course up on a miss
+    result = Course.remove_scheduled_class(course_id, event_id, g.current_user['_id'])
     
     if result.modified_count > 0:
         return jsonify({'success': True})
-    else:
-        return jsonify({'error': 'Class not found'}), 404
+    
+    _, error = _owned_course(course_id, {'_id': 1})
+    return error or (jsonify({'error': 'Class not found'}), 404)
@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, g
-from datetime import datetime, timezone
+from datetime import datetime
 from app.models.user import User
 from app.models.course import Course
 from app.models.enrollment import Enrollment
 from app.models.recording import Recording
+from app.utils.parallel import run_parallel
 from app.utils.validators import validate_clerk_user_id
 
 dashboard_bp = Blueprint('dashboard', __name__)
@@ -68,20 +69,32 @@ def instructor_data():
     if user.get('role') != 'instructor':
         return {'error': 'Instructor access required'}, 403
     
-    courses = Course.find_by_instructor(user['_id'])
+    courses = Course.find_by_instructor(user['_id'], {
+        'title': 1,
+        'is_published': 1,
+        'is_completed': 1,
+        'attendance_active': 1,
+        'scheduled_classes': 1
+    })
+    
+    # Two grouped counts for all courses (run concurrently) instead of two per course
+    course_ids = [course['_id'] for course in courses]
+    student_counts, recording_counts = run_parallel(
+        lambda: Enrollment.count_by_courses(course_ids),
+        lambda: Recording.count_by_courses(course_ids)
+    )
     
     total_students = 0
     total_recordings = 0
     upcoming_classes = []
     
-    # Always use UTC for consistent comparison
-    from datetime import timezone
-    now_utc = datetime.now(timezone.utc)
+    # PyMongo returns BSON dates as naive UTC, so compare against naive UTC
+    now_utc = datetime.utcnow()
     
     courses_data = []
     for course in courses:
-        student_count = Enrollment.count_by_course(course['_id'])
-        recording_count = Recording.count_by_course(course['_id'])
+        student_count = student_counts.get(course['_id'], 0)
+        recording_count = recording_counts.get(course['_id'], 0)
         total_students += student_count
         total_recordings += recording_count
         
@@ -99,15 +112,13 @@ def instructor_data():
             scheduled_dt = scheduled.get('datetime')
             # Only include future classes that are NOT manually marked completed
             if scheduled_dt and not scheduled.get('is_completed'):
-                if scheduled_dt.tzinfo is None:
-                    scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
                 if scheduled_dt > now_utc:
                     upcoming_classes.append({
                         'title': scheduled.get('title'),
                         'course_title': course['title'],
                         'course_id': str(course['_id']),
                         'event_id': scheduled.get('calendar_event_id'),
-                        'datetime': scheduled_dt.isoformat(),
+                        'datetime': scheduled_dt.isoformat() + '+00:00',
                         'meet_link': scheduled.get('meet_link')
                     })
     
@@ -137,73 +148,82 @@ def student_data():
     if not user:
         return {'error': 'User not found'}, 404
     
-    enrollments = Enrollment.find_by_student(user['_id'])
+    # Enrollments and the catalog are independent; fetch them concurrently.
+    # The catalog is the cached landing/list aggregation, instructor
+    # names already joined, so recommendations usually cost no query
+    enrollments, published = run_parallel(
+        lambda: Enrollment.find_by_student_with_courses(user['_id']),
+        Course.find_published_with_stats
+    )
+    
+    # Get ALL non-enrolled published courses for recommendations
+    enrolled_ids = {e['course_id'] for e in enrollments}
+    recommended_courses = [c for c in published if c['_id'] not in enrolled_ids]
+    
+    # Batch the per-course lookups: one query for the enrolled courses'
+    # instructors and one grouped query for their recordings, concurrently
+    instructors, recording_ids = run_parallel(
+        lambda: User.find_by_ids([e['course']['instructor_id'] for e in enrollments], {'name': 1}),
+        lambda: Recording.ids_by_courses(list(enrolled_ids))
+    )
     
     enrolled_courses = []
     upcoming_classes = []
     
-    # Always use UTC for consistent comparison
-    from datetime import timezone
-    now_utc = datetime.now(timezone.utc)
+    # PyMongo returns BSON dates as naive UTC, so compare against naive UTC
+    now_utc = datetime.utcnow()
     
     for enrollment in enrollments:
-        course = Course.find_by_id(enrollment['course_id'])
-        if course:
-            instructor = User.find_by_id(course['instructor_id'])
-            recording_count = Recording.count_by_course(course['_id'])
-            recordings = Recording.find_by_course(course['_id'])
-            watched = sum(1 for r in recordings if enrollment.get('progress', {}).get(str(r['_id'])))
-            progress_percent = int((watched / len(recordings) * 100) if recordings else 0)
-            
-            # Count completed classes (past scheduled classes or manually marked) - use UTC
-            completed_classes_count = 0
-            for scheduled in course.get('scheduled_classes', []):
-                scheduled_dt = scheduled.get('datetime')
-                if scheduled_dt:
-                    if scheduled_dt.tzinfo is None:
-                        scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
-                    if scheduled.get('is_completed') or scheduled_dt <= now_utc:
-                        completed_classes_count += 1
-            
-            enrolled_courses.append({
-                '_id': str(course['_id']),
-                'title': course['title'],
-                'instructor_name': instructor['name'] if instructor else 'Instructor',
-                'recording_count': recording_count,
-                'completed_classes_count': completed_classes_count,
-                'progress_percent': progress_percent,
-                'thumbnail': course.get('thumbnail'),
-                'is_completed': course.get('is_completed', False)
-            })
-            
-            for scheduled in course.get('scheduled_classes', []):
-                scheduled_dt = scheduled.get('datetime')
-                # Only include future classes that aren't manually marked completed - use UTC
-                if scheduled_dt:
-                    if scheduled_dt.tzinfo is None:
-                        scheduled_dt = scheduled_dt.replace(tzinfo=timezone.utc)
-                    if scheduled_dt > now_utc and not scheduled.get('is_completed'):
-                        upcoming_classes.append({
-                            'title': scheduled.get('title'),
-                            'course_title': course['title'],
-                            'datetime': scheduled_dt.isoformat(),
-                            'meet_link': scheduled.get('meet_link')
-                        })
+        course = enrollment['course']
+        instructor = instructors.get(course['instructor_id'])
+        recordings = recording_ids.get(course['_id'], [])
+        recording_count = len(recordings)
+        # Progress is keyed by recording ID string; False means un-watched
+        watched_ids = {key for key, value in enrollment.get('progress', {}).items() if value}
+        watched = len(watched_ids.intersection(recordings))
+        progress_percent = int((watched / recording_count * 100) if recordings else 0)
+        
+        # Count completed classes (past scheduled classes or manually marked) - use UTC
+        completed_classes_count = 0
+        for scheduled in course.get('scheduled_classes', []):
+            scheduled_dt = scheduled.get('datetime')
+            if scheduled_dt:
+                if scheduled.get('is_completed') or scheduled_dt <= now_utc:
+                    completed_classes_count += 1
+        
+        enrolled_courses.append({
+            '_id': str(course['_id']),
+            'title': course['title'],
+            'instructor_name': instructor['name'] if instructor else 'Instructor',
+            'recording_count': recording_count,
+            'completed_classes_count': completed_classes_count,
+            'progress_percent': progress_percent,
+            'thumbnail': course.get('thumbnail'),
+            'is_completed': course.get('is_completed', False)
+        })
+        
+        for scheduled in course.get('scheduled_classes', []):
+            scheduled_dt = scheduled.get('datetime')
+            # Only include future classes that aren't manually marked completed - use UTC
+            if scheduled_dt:
+                if scheduled_dt > now_utc and not scheduled.get('is_completed'):
+                    upcoming_classes.append({
+                        'title': scheduled.get('title'),
+                        'course_title': course['title'],
+                        'datetime': scheduled_dt.isoformat() + '+00:00',
+                        'meet_link': scheduled.get('meet_link')
+                    })
     
-    # Get ALL non-enrolled published courses for recommendations
-    all_courses = Course.find_all_published()
-    enrolled_ids = [str(e['course_id']) for e in enrollments]
     recommended = []
-    for c in all_courses:
-        if str(c['_id']) not in enrolled_ids:
-            instructor = User.find_by_id(c['instructor_id'])
-            recommended.append({
-                '_id': str(c['_id']),
-                'title': c['title'],
-                'price': c.get('price', 0),
-                'instructor_name': instructor['name'] if instructor else 'Instructor',
-                'thumbnail': c.get('thumbnail')
-            })
+    for c in recommended_courses:
+        instructor = c.get('instructor')
+        recommended.append({
+            '_id': str(c['_id']),
+            'title': c['title'],
+            'price': c.get('price', 0),
+            'instructor_name': instructor['name'] if instructor else 'Instructor',
+            'thumbnail': c.get('thumbnail')
+        })
     
     return {
         'user': {
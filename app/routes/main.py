@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, request
 from datetime import datetime
+from pymongo.errors import PyMongoError
+from app import get_db
 from app.models.course import Course
-from app.models.user import User
-from app.models.enrollment import Enrollment
 
 main_bp = Blueprint('main', __name__)
 
@@ -10,13 +10,8 @@ main_bp = Blueprint('main', __name__)
 @main_bp.route('/')
 def landing():
     """Landing page with course showcase."""
-    courses = Course.find_all_published()
-    
-    # Add instructor info and stats to each course
-    for course in courses:
-        instructor = User.find_by_id(course['instructor_id'])
-        course['instructor'] = instructor
-        course['student_count'] = Enrollment.count_by_course(course['_id'])
+    # Instructor and student count are joined in by the aggregation
+    courses = Course.find_published_with_stats()
     
     return render_template('landing.html', courses=courses)
 
@@ -43,7 +38,11 @@ def sign_up():
 
 @main_bp.route('/health')
 def health():
-    """Health check endpoint."""
+    """Health check endpoint. Also warms the MongoDB connection pool."""
+    try:
+        get_db().command('ping')
+    except PyMongoError:
+        return {'status': 'error', 'database': 'unreachable'}, 503
     return {'status': 'ok'}
 
 @main_bp.route("/favicon.ico")
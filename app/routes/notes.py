@@ -1,47 +1,30 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify
 from app.models.note import Note
 from app.models.course import Course
-from app.utils.clerk import require_auth, require_instructor
-from app.utils.validators import sanitize_string, validate_google_drive_link, validate_object_id
+from app.utils.clerk import require_auth, require_course_instructor
+from app.utils.validators import sanitize_string, validate_google_drive_link
 
 notes_bp = Blueprint('notes', __name__)
 
 
-@notes_bp.route('/api/courses/<course_id>/notes')
+@notes_bp.route('/api/courses/<oid:course_id>/notes')
 @require_auth
 def list_notes(course_id):
     """List all notes for a course."""
-    course = Course.find_by_id(course_id)
+    course = Course.find_by_id(course_id, {'_id': 1})
     if not course:
         return jsonify({'error': 'Course not found'}), 404
     
-    notes = Note.find_by_course(course_id)
-    
-    # Convert ObjectIds to strings
-    for note in notes:
-        note['_id'] = str(note['_id'])
-        note['course_id'] = str(note['course_id'])
-        if note.get('created_at'):
-            note['created_at'] = note['created_at'].isoformat()
+    # Projection returns the notes already JSON-ready
+    notes = Note.find_by_course_serialized(course_id)
     
     return jsonify(notes)
 
 
-@notes_bp.route('/api/courses/<course_id>/notes', methods=['POST'])
-@require_instructor
+@notes_bp.route('/api/courses/<oid:course_id>/notes', methods=['POST'])
+@require_course_instructor
 def add_note(course_id):
     """Add a note to a course."""
-    # Validate course_id
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID'}), 400
-    
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     
     # Validate and sanitize inputs
@@ -62,23 +45,13 @@ def add_note(course_id):
         description=description
     )
     
-    note['_id'] = str(note['_id'])
-    note['course_id'] = str(note['course_id'])
-    
     return jsonify(note), 201
 
 
-@notes_bp.route('/api/courses/<course_id>/notes/<note_id>', methods=['PUT'])
-@require_instructor
+@notes_bp.route('/api/courses/<oid:course_id>/notes/<oid:note_id>', methods=['PUT'])
+@require_course_instructor
 def update_note(course_id, note_id):
     """Update a note."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     update_data = {}
     
@@ -94,17 +67,10 @@ def update_note(course_id, note_id):
     return jsonify({'success': True})
 
 
-@notes_bp.route('/api/courses/<course_id>/notes/<note_id>', methods=['DELETE'])
-@require_instructor
+@notes_bp.route('/api/courses/<oid:course_id>/notes/<oid:note_id>', methods=['DELETE'])
+@require_course_instructor
 def delete_note(course_id, note_id):
     """Delete a note."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     Note.delete(note_id)
     
     return jsonify({'success': True})
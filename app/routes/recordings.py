@@ -1,51 +1,34 @@
 from flask import Blueprint, request, jsonify, g
 from datetime import datetime
+from functools import partial
 from app.models.recording import Recording
 from app.models.course import Course
-from app.utils.clerk import require_auth, require_instructor
-from app.utils.validators import sanitize_string, validate_google_drive_link, validate_object_id
-from app.services.google_drive import GoogleDriveService
+from app.models.user import User
+from app.utils.clerk import require_auth, require_instructor, require_course_instructor
+from app.utils.validators import sanitize_string, validate_google_drive_link
+from app.utils.responses import stream_json_list
 
 recordings_bp = Blueprint('recordings', __name__)
 
 
-@recordings_bp.route('/courses/<course_id>/recordings')
+@recordings_bp.route('/courses/<oid:course_id>/recordings')
 @require_auth
 def list_recordings(course_id):
     """List all recordings for a course."""
-    course = Course.find_by_id(course_id)
+    course = Course.find_by_id(course_id, {'_id': 1})
     if not course:
         return jsonify({'error': 'Course not found'}), 404
     
-    recordings = Recording.find_by_course(course_id)
-    
-    # Convert ObjectIds to strings
-    for recording in recordings:
-        recording['_id'] = str(recording['_id'])
-        recording['course_id'] = str(recording['course_id'])
-        if recording.get('recorded_at'):
-            recording['recorded_at'] = recording['recorded_at'].isoformat()
-        if recording.get('created_at'):
-            recording['created_at'] = recording['created_at'].isoformat()
-    
-    return jsonify(recordings)
+    # Stream straight from the cursor; the projection does the serialization
+    return stream_json_list(
+        Recording.iter_by_course(course_id, projection=Recording.SERIALIZED_PROJECTION)
+    )
 
 
-@recordings_bp.route('/courses/<course_id>/recordings', methods=['POST'])
-@require_instructor
+@recordings_bp.route('/courses/<oid:course_id>/recordings', methods=['POST'])
+@require_course_instructor
 def add_recording(course_id):
     """Manually add a recording to a course."""
-    # Validate course_id
-    if not validate_object_id(course_id):
-        return jsonify({'error': 'Invalid course ID'}), 400
-    
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     
     # Validate and sanitize inputs
@@ -73,7 +56,7 @@ def add_recording(course_id):
         except ValueError:
             pass
     
-    recording = Recording.create(
+    recording, created = Recording.create(
         course_id=course_id,
         title=title,
         drive_file_id=drive_file_id,
@@ -81,24 +64,16 @@ def add_recording(course_id):
         duration=duration,
         recorded_at=recorded_at
     )
-    
-    recording['_id'] = str(recording['_id'])
-    recording['course_id'] = str(recording['course_id'])
+    if not created:
+        return jsonify({'error': 'Recording already exists'}), 409
     
     return jsonify(recording), 201
 
 
-@recordings_bp.route('/courses/<course_id>/recordings/<recording_id>', methods=['PUT'])
-@require_instructor
+@recordings_bp.route('/courses/<oid:course_id>/recordings/<oid:recording_id>', methods=['PUT'])
+@require_course_instructor
 def update_recording(course_id, recording_id):
     """Update a recording."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     data = request.get_json()
     update_data = {}
     
@@ -114,65 +89,54 @@ def update_recording(course_id, recording_id):
     return jsonify({'success': True})
 
 
-@recordings_bp.route('/courses/<course_id>/recordings/<recording_id>', methods=['DELETE'])
-@require_instructor
+@recordings_bp.route('/courses/<oid:course_id>/recordings/<oid:recording_id>', methods=['DELETE'])
+@require_course_instructor
 def delete_recording(course_id, recording_id):
     """Delete a recording."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
-    
     Recording.delete(recording_id)
     
     return jsonify({'success': True})
 
 
-@recordings_bp.route('/courses/<course_id>/sync-recordings', methods=['POST'])
-@require_instructor
+@recordings_bp.route('/courses/<oid:course_id>/sync-recordings', methods=['POST'])
+@require_course_instructor
 def sync_recordings(course_id):
     """Sync recordings from Google Drive."""
-    course = Course.find_by_id(course_id)
-    if not course:
-        return jsonify({'error': 'Course not found'}), 404
-    
-    if course['instructor_id'] != g.current_user['_id']:
-        return jsonify({'error': 'Not authorized'}), 403
+    from app.services.google_drive import GoogleDriveService
     
     # Check if user has Google tokens
     if not g.current_user.get('google_tokens'):
         return jsonify({'error': 'Please connect Google account first'}), 400
     
     try:
-        drive_service = GoogleDriveService(g.current_user['google_tokens'])
+        drive_service = GoogleDriveService(
+            g.current_user['google_tokens'],
+            on_refresh=partial(User.update_google_tokens, g.current_user['clerk_id'])
+        )
         
         # Get recent Meet recordings
         drive_files = drive_service.list_meet_recordings(days_back=30)
         
-        # Get existing recordings to avoid duplicates
-        existing = Recording.find_by_course(course_id)
-        existing_file_ids = {r.get('drive_file_id') for r in existing if r.get('drive_file_id')}
+        # Only look up the listed file IDs to avoid duplicates
+        existing_file_ids = Recording.existing_drive_file_ids(
+            course_id, [file['id'] for file in drive_files]
+        )
+        new_files = [file for file in drive_files if file['id'] not in existing_file_ids]
+        
+        # Share all new files in batched calls; link and duration already
+        # come back with the listing
+        drive_service.share_files([file['id'] for file in new_files])
         
-        added = []
-        for file in drive_files:
-            if file['id'] not in existing_file_ids:
-                # Create shareable link
-                share_link = drive_service.create_shareable_link(file['id'])
-                duration = drive_service.get_video_duration(file['id'])
-                
-                recording = Recording.create(
-                    course_id=course_id,
-                    title=file['name'],
-                    drive_file_id=file['id'],
-                    drive_link=share_link or file.get('webViewLink'),
-                    duration=duration,
-                    recorded_at=datetime.fromisoformat(file['createdTime'].replace('Z', '+00:00'))
-                )
-                
-                recording['_id'] = str(recording['_id'])
-                added.append(recording)
+        added = Recording.create_many(course_id, [
+            {
+                'title': file['name'],
+                'drive_file_id': file['id'],
+                'drive_link': file.get('webViewLink'),
+                'duration': drive_service.duration_seconds(file),
+                'recorded_at': datetime.fromisoformat(file['createdTime'].replace('Z', '+00:00'))
+            }
+            for file in new_files
+        ])
         
         return jsonify({
             'success': True,
@@ -188,11 +152,16 @@ def sync_recordings(course_id):
 @require_instructor
 def list_drive_recordings():
     """List available recordings from Google Drive."""
+    from app.services.google_drive import GoogleDriveService
+    
     if not g.current_user.get('google_tokens'):
         return jsonify({'error': 'Please connect Google account first'}), 400
     
     try:
-        drive_service = GoogleDriveService(g.current_user['google_tokens'])
+        drive_service = GoogleDriveService(
+            g.current_user['google_tokens'],
+            on_refresh=partial(User.update_google_tokens, g.current_user['clerk_id'])
+        )
         recordings = drive_service.list_meet_recordings(days_back=30)
         
         return jsonify(recordings)
@@ -5,6 +5,7 @@ Generates certificates by overlaying text on a PNG template.
 
 import os
 import io
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import landscape, A4
@@ -31,9 +32,16 @@ class CertificateGenerator:
     SECONDARY_COLOR = "#888888"
     LABEL_COLOR = "#666666"
     
+    # (text, font) -> bbox for the fixed labels, which repeat on every render
+    _static_bbox_cache = {}
+    
     @classmethod
+    @lru_cache(maxsize=32)
     def get_font(cls, size, bold=False):
-        """Get a font, falling back to default if custom fonts not available."""
+        """Get a font, falling back to default if custom fonts not available.
+        
+        Cached per (size, bold) so font files are parsed once per process.
+        """
         try:
             # Try to load a custom font
             font_name = 'Poppins-Bold.ttf' if bold else 'Poppins-Regular.ttf'
@@ -72,18 +80,31 @@ class CertificateGenerator:
         
         Returns a BytesIO object containing the PNG image.
         """
+        img = cls._render_image(
+            student_name, course_title, instructor_name, certificate_code,
+            attendance_count, total_classes, attendance_percentage, issued_date,
+            template_name
+        )
+        
+        # Save to BytesIO with high quality
+        img_buffer = io.BytesIO()
+        img.save(img_buffer, format='PNG', optimize=False)
+        img.close()
+        img_buffer.seek(0)
+        
+        return img_buffer
+    
+    @classmethod
+    def _render_image(cls, student_name: str, course_title: str,
+                      instructor_name: str, certificate_code: str,
+                      attendance_count: int, total_classes: int,
+                      attendance_percentage: float, issued_date: datetime,
+                      template_name: str = None) -> Image.Image:
+        """Draw the certificate text onto a copy of the template."""
         template_path = os.path.join(cls.TEMPLATE_DIR, template_name or cls.DEFAULT_TEMPLATE)
         
-        # Check if template exists, if not create a default one
-        if not os.path.exists(template_path):
-            img = cls._create_default_template()
-        else:
-            img = Image.open(template_path).convert('RGBA')
-            # Scale up template if needed for quality
-            if img.width < cls.BASE_WIDTH:
-                scale = cls.BASE_WIDTH / img.width
-                new_height = int(img.height * scale)
-                img = img.resize((cls.BASE_WIDTH, new_height), Image.Resampling.LANCZOS)
+        # Draw on a copy; the cached template must stay pristine
+        img = cls._load_template(template_path).copy()
         
         draw = ImageDraw.Draw(img)
         width, height = img.size
@@ -100,12 +121,12 @@ class CertificateGenerator:
         # Certificate title
         title_font = cls.get_font(title_size, bold=True)
         cls._draw_centered_text(draw, "CERTIFICATE OF COMPLETION", 
-                               width // 2, int(height * 0.20), title_font, cls.PRIMARY_COLOR)
+                               width // 2, int(height * 0.20), title_font, cls.PRIMARY_COLOR, static=True)
         
         # "This is to certify that"
         subtitle_font = cls.get_font(subtitle_size)
         cls._draw_centered_text(draw, "This is to certify that",
-                               width // 2, int(height * 0.30), subtitle_font, cls.SECONDARY_COLOR)
+                               width // 2, int(height * 0.30), subtitle_font, cls.SECONDARY_COLOR, static=True)
         
         # Student Name (large, prominent) - SAME COLOR AS COURSE TITLE
         name_font = cls.get_font(name_size, bold=True)
@@ -114,7 +135,7 @@ class CertificateGenerator:
         
         # "has successfully completed the course"
         cls._draw_centered_text(draw, "has successfully completed the course",
-                               width // 2, int(height * 0.48), subtitle_font, cls.SECONDARY_COLOR)
+                               width // 2, int(height * 0.48), subtitle_font, cls.SECONDARY_COLOR, static=True)
         
         # Course Title - PRIMARY COLOR
         course_font = cls.get_font(course_size, bold=True)
@@ -131,52 +152,16 @@ class CertificateGenerator:
         info_font = cls.get_font(info_size, bold=True)
         label_font = cls.get_font(label_size)
         bottom_y = int(height * 0.78)
-        label_offset = int(height * 0.04)
-        
-        # Instructor name (left side) - PRIMARY COLOR
-        instructor_x = int(width * 0.18)
-        cls._draw_centered_text(draw, instructor_name, instructor_x, bottom_y, info_font, cls.PRIMARY_COLOR)
-        # Draw underline
-        instructor_bbox = draw.textbbox((0, 0), instructor_name, font=info_font)
-        line_width = instructor_bbox[2] - instructor_bbox[0]
-        draw.line([(instructor_x - line_width//2, bottom_y + int(height * 0.02)), 
-                   (instructor_x + line_width//2, bottom_y + int(height * 0.02))],
-                  fill=cls.LABEL_COLOR, width=2)
-        cls._draw_centered_text(draw, "Course Instructor", instructor_x, bottom_y + label_offset, label_font, cls.LABEL_COLOR)
-        
-        # Issue date (center) - PRIMARY COLOR
-        date_str = issued_date.strftime("%B %d, %Y")
-        date_x = width // 2
-        cls._draw_centered_text(draw, date_str, date_x, bottom_y, info_font, cls.PRIMARY_COLOR)
-        # Draw underline
-        date_bbox = draw.textbbox((0, 0), date_str, font=info_font)
-        line_width = date_bbox[2] - date_bbox[0]
-        draw.line([(date_x - line_width//2, bottom_y + int(height * 0.02)), 
-                   (date_x + line_width//2, bottom_y + int(height * 0.02))],
-                  fill=cls.LABEL_COLOR, width=2)
-        cls._draw_centered_text(draw, "Date Issued", date_x, bottom_y + label_offset, label_font, cls.LABEL_COLOR)
-        
-        # Certificate code (right side) - PRIMARY COLOR
-        code_x = int(width * 0.82)
-        cls._draw_centered_text(draw, certificate_code, code_x, bottom_y, info_font, cls.PRIMARY_COLOR)
-        # Draw underline
-        code_bbox = draw.textbbox((0, 0), certificate_code, font=info_font)
-        line_width = code_bbox[2] - code_bbox[0]
-        draw.line([(code_x - line_width//2, bottom_y + int(height * 0.02)), 
-                   (code_x + line_width//2, bottom_y + int(height * 0.02))],
-                  fill=cls.LABEL_COLOR, width=2)
-        cls._draw_centered_text(draw, "Certificate ID", code_x, bottom_y + label_offset, label_font, cls.LABEL_COLOR)
-        
-        # Enhance image quality
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(1.2)
         
-        # Save to BytesIO with high quality
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='PNG', optimize=False)
-        img_buffer.seek(0)
+        # Instructor name (left), issue date (center), certificate code (right)
+        cls._draw_signature_block(draw, instructor_name, "Course Instructor",
+                                  int(width * 0.18), bottom_y, info_font, label_font, height)
+        cls._draw_signature_block(draw, issued_date.strftime("%B %d, %Y"), "Date Issued",
+                                  width // 2, bottom_y, info_font, label_font, height)
+        cls._draw_signature_block(draw, certificate_code, "Certificate ID",
+                                  int(width * 0.82), bottom_y, info_font, label_font, height)
         
-        return img_buffer
+        return img
     
     @classmethod
     def generate_certificate_pdf(cls, student_name: str, course_title: str,
@@ -189,8 +174,8 @@ class CertificateGenerator:
         
         Returns a BytesIO object containing the PDF.
         """
-        # First generate the image
-        img_buffer = cls.generate_certificate_image(
+        # Render the image; ReportLab reads its pixels directly, no PNG round trip
+        img = cls._render_image(
             student_name, course_title, instructor_name, certificate_code,
             attendance_count, total_classes, attendance_percentage, issued_date,
             template_name
@@ -200,7 +185,6 @@ class CertificateGenerator:
         pdf_buffer = io.BytesIO()
         
         # Get image dimensions for PDF sizing
-        img = Image.open(img_buffer)
         img_width, img_height = img.size
         
         # Calculate PDF page size to match image aspect ratio (A4 landscape base)
@@ -210,24 +194,68 @@ class CertificateGenerator:
         
         c = canvas.Canvas(pdf_buffer, pagesize=(pdf_width, pdf_height))
         
-        # Reset image buffer position
-        img_buffer.seek(0)
-        
         # Draw image on PDF with high quality
-        c.drawImage(ImageReader(img_buffer), 0, 0, width=pdf_width, height=pdf_height)
+        c.drawImage(ImageReader(img), 0, 0, width=pdf_width, height=pdf_height)
         
         c.save()
+        # Free the ~33 MB render now rather than whenever the frame is collected
+        img.close()
         pdf_buffer.seek(0)
         
         return pdf_buffer
     
     @classmethod
-    def _draw_centered_text(cls, draw, text, x, y, font, color):
-        """Draw text centered at the given coordinates with anti-aliasing."""
-        bbox = draw.textbbox((0, 0), text, font=font)
+    @lru_cache(maxsize=2)
+    def _load_template(cls, template_path) -> Image.Image:
+        """Decode, upscale and sharpen a template once per process (~33 MB each at 4K)."""
+        # Check if template exists, if not create a default one
+        if not os.path.exists(template_path):
+            img = cls._create_default_template()
+        else:
+            img = Image.open(template_path).convert('RGBA')
+            # Scale up template if needed for quality
+            if img.width < cls.BASE_WIDTH:
+                scale = cls.BASE_WIDTH / img.width
+                new_height = int(img.height * scale)
+                img = img.resize((cls.BASE_WIDTH, new_height), Image.Resampling.LANCZOS)
+        
+        # Sharpen the background here rather than the whole 4K image on every
+        # render; text is drawn at full resolution and doesn't need it
+        return ImageEnhance.Sharpness(img).enhance(1.2)
+    
+    @classmethod
+    def _draw_centered_text(cls, draw, text, x, y, font, color, static=False):
+        """Draw text centered at the given coordinates with anti-aliasing.
+        
+        Returns the text width. Pass static=True for fixed strings so their
+        bounding box is measured once per font instead of on every render.
+        """
+        if static:
+            key = (text, font)
+            bbox = cls._static_bbox_cache.get(key)
+            if bbox is None:
+                bbox = cls._static_bbox_cache[key] = draw.textbbox((0, 0), text, font=font)
+        else:
+            bbox = draw.textbbox((0, 0), text, font=font)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         draw.text((x - text_width // 2, y - text_height // 2), text, font=font, fill=color)
+        return text_width
+    
+    @classmethod
+    def _draw_signature_block(cls, draw, text, label, x, y, info_font, label_font, height):
+        """Draw underlined `text` centered at (x, y) with a small `label` below it."""
+        # Value - PRIMARY COLOR
+        line_width = cls._draw_centered_text(draw, text, x, y, info_font, cls.PRIMARY_COLOR)
+        
+        # 2px underline as a filled rectangle; cheaper than a wide line for
+        # an axis-aligned stroke
+        line_y = y + int(height * 0.02)
+        draw.rectangle([x - line_width // 2, line_y, x + line_width // 2, line_y + 1],
+                       fill=cls.LABEL_COLOR)
+        
+        cls._draw_centered_text(draw, label, x, y + int(height * 0.04), label_font,
+                                cls.LABEL_COLOR, static=True)
     
     @classmethod
     def _create_default_template(cls) -> Image.Image:
@@ -235,17 +263,21 @@ class CertificateGenerator:
         # Create a high-resolution landscape certificate (4K)
         width, height = cls.BASE_WIDTH, cls.BASE_HEIGHT
         
-        # Create gradient background
-        img = Image.new('RGBA', (width, height), (26, 26, 46, 255))
-        draw = ImageDraw.Draw(img)
-        
-        # Draw smooth gradient effect
+        # Smooth vertical gradient: build a 1px-wide column and stretch it
+        # across the width in C, rather than drawing every row
+        column = bytearray()
         for i in range(height):
             progress = i / height
-            r = int(20 + (12 - 20) * progress)
-            g = int(20 + (28 - 20) * progress)
-            b = int(40 + (55 - 40) * progress)
-            draw.line([(0, i), (width, i)], fill=(r, g, b, 255))
+            column += bytes((
+                int(20 + (12 - 20) * progress),
+                int(20 + (28 - 20) * progress),
+                int(40 + (55 - 40) * progress),
+                255
+            ))
+        img = Image.frombytes('RGBA', (1, height), bytes(column)).resize(
+            (width, height), Image.Resampling.NEAREST
+        )
+        draw = ImageDraw.Draw(img)
         
         # Draw outer border
         border_color = (233, 69, 96, 255)  # #e94560
@@ -0,0 +1,109 @@
+"""Shared construction of Google API clients."""
+import hashlib
+import json
+import queue
+import threading
+from datetime import datetime
+from functools import lru_cache
+from flask import after_this_request, has_request_context
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+from app.config import Config
+from app.utils.cache import TTLCache
+
+# Retries for idempotent calls: googleapiclient backs off exponentially
+# (with jitter) on 429/5xx and rate-limit 403s. Creates aren't retried,
+# since a retried insert can land twice
+API_RETRIES = 3
+
+# One Credentials object (and refresh lock) per Google account, so
+# concurrent requests for the same user share a single token refresh
+_credentials_cache = TTLCache(maxsize=1024, ttl=3600)
+_credentials_lock = threading.Lock()
+
+# Token refreshes share one keep-alive session to oauth2.googleapis.com
+_refresh_request = Request()
+
+# Idle httplib2 transports. httplib2.Http keeps its connections open but
+# isn't safe for concurrent use, so each request checks one out
+# exclusively and hands it back when the response is sent
+_http_pool = queue.LifoQueue(maxsize=32)
+
+
+@lru_cache(maxsize=None)
+def _discovery_document(api: str, version: str) -> dict:
+    """Read and parse the discovery document bundled with the client, once per process."""
+    return json.loads(get_static_doc(api, version))
+
+
+def get_credentials(tokens: dict, on_refresh=None) -> Credentials:
+    """Return shared, valid Credentials for a user's stored Google tokens.
+    
+    An expired access token is refreshed once under a per-account lock;
+    `on_refresh(tokens)` then receives the updated tokens dict to persist.
+    """
+    account_token = tokens.get('refresh_token') or tokens.get('access_token') or ''
+    key = hashlib.sha256(account_token.encode()).hexdigest()
+    
+    with _credentials_lock:
+        entry = _credentials_cache.get(key)
+        if entry is None:
+            expires_at = tokens.get('expires_at')
+            credentials = Credentials(
+                token=tokens.get('access_token'),
+                refresh_token=tokens.get('refresh_token'),
+                token_uri='https://oauth2.googleapis.com/token',
+                client_id=Config.GOOGLE_CLIENT_ID,
+                client_secret=Config.GOOGLE_CLIENT_SECRET,
+                scopes=Config.GOOGLE_SCOPES,
+                expiry=datetime.fromisoformat(expires_at) if expires_at else None
+            )
+            entry = (credentials, threading.Lock())
+            _credentials_cache.set(key, entry)
+    credentials, refresh_lock = entry
+    
+    if not credentials.valid and credentials.refresh_token:
+        with refresh_lock:
+            # Another request may have refreshed while we waited
+            if not credentials.valid:
+                credentials.refresh(_refresh_request)
+                if on_refresh is not None:
+                    on_refresh(dict(
+                        tokens,
+                        access_token=credentials.token,
+                        expires_at=credentials.expiry.isoformat() if credentials.expiry else None
+                    ))
+    return credentials
+
+
+def _checkout_http():
+    """Take an idle transport from the pool (or make one) for this request."""
+    try:
+        http = _http_pool.get_nowait()
+    except queue.Empty:
+        http = build_http()
+    
+    if has_request_context():
+        @after_this_request
+        def release_http(response):
+            try:
+                _http_pool.put_nowait(http)
+            except queue.Full:
+                pass
+            return response
+    return http
+
+
+def build_service(api: str, version: str, credentials):
+    """Build an API resource from the cached discovery document.
+    
+    Same as build(api, version, credentials=...) with static discovery,
+    minus re-reading and re-parsing the JSON on every request, and over a
+    pooled transport whose TLS connections to Google outlive the request.
+    """
+    http = AuthorizedHttp(credentials, http=_checkout_http())
+    return build_from_document(_discovery_document(api, version), http=http)
@@ -1,23 +1,48 @@
+import hashlib
 from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from app.config import Config
+from app.services.google_api import API_RETRIES, build_service, get_credentials
+from app.utils.cache import TTLCache
+
+# Google's batch endpoint accepts at most 100 calls per request
+BATCH_LIMIT = 100
+
+MEET_FOLDER_NAME = 'Meet Recordings'
+
+# Fields sync_recordings and the recordings API actually read
+RECORDING_FIELDS = 'files(id, name, createdTime, webViewLink, videoMediaMetadata)'
+
+# Each user's "Meet Recordings" folder ID, keyed by a hash of their refresh token
+_meet_folder_cache = TTLCache(maxsize=1024, ttl=3600)
 
 
 class GoogleDriveService:
     """Service for accessing Google Drive recordings."""
     
-    def __init__(self, tokens: dict):
-        """Initialize with user's OAuth tokens."""
-        self.credentials = Credentials(
-            token=tokens.get('access_token'),
-            refresh_token=tokens.get('refresh_token'),
-            token_uri='https://oauth2.googleapis.com/token',
-            client_id=Config.GOOGLE_CLIENT_ID,
-            client_secret=Config.GOOGLE_CLIENT_SECRET,
-            scopes=Config.GOOGLE_SCOPES
-        )
-        self.service = build('drive', 'v3', credentials=self.credentials)
+    def __init__(self, tokens: dict, on_refresh=None):
+        """Initialize with user's OAuth tokens; on_refresh persists refreshed ones."""
+        self.credentials = get_credentials(tokens, on_refresh)
+        self.service = build_service('drive', 'v3', self.credentials)
+        account_token = tokens.get('refresh_token') or tokens.get('access_token') or ''
+        self._account_key = hashlib.sha256(account_token.encode()).hexdigest()
+    
+    def _meet_folder_id(self):
+        """ID of the user's Meet recordings folder, or None if it can't be found."""
+        folder_id = _meet_folder_cache.get(self._account_key)
+        if folder_id is None:
+            results = self.service.files().list(
+                q=(
+                    "mimeType = 'application/vnd.google-apps.folder' and "
+                    f"name = '{MEET_FOLDER_NAME}' and trashed = false"
+                ),
+                spaces='drive',
+                fields='files(id)',
+                pageSize=1
+            ).execute(num_retries=API_RETRIES)
+            folders = results.get('files', [])
+            # Cache misses too ('' = no folder) so we don't look again each sync
+            folder_id = folders[0]['id'] if folders else ''
+            _meet_folder_cache.set(self._account_key, folder_id)
+        return folder_id or None
     
     def list_meet_recordings(self, days_back: int = 30) -> list:
         """
@@ -27,21 +52,24 @@ class GoogleDriveService:
         # Calculate the date range
         since_date = (datetime.utcnow() - timedelta(days=days_back)).isoformat() + 'Z'
         
-        # Search for video files in Meet Recordings folder
-        query = (
-            f"mimeType contains 'video/' and "
-            f"createdTime > '{since_date}' and "
-            f"name contains 'Meet'"
-        )
-        
         try:
+            # Search for video files in Meet Recordings folder; fall back to
+            # matching on the file name if the folder doesn't exist
+            folder_id = self._meet_folder_id()
+            scope = f"'{folder_id}' in parents" if folder_id else "name contains 'Meet'"
+            query = (
+                f"{scope} and "
+                f"mimeType contains 'video/' and "
+                f"createdTime > '{since_date}'"
+            )
+            
             results = self.service.files().list(
                 q=query,
                 spaces='drive',
-                fields='files(id, name, mimeType, createdTime, size, webViewLink, thumbnailLink)',
+                fields=RECORDING_FIELDS,
                 orderBy='createdTime desc',
                 pageSize=50
-            ).execute()
+            ).execute(num_retries=API_RETRIES)
             
             return results.get('files', [])
         except Exception as e:
@@ -54,12 +82,46 @@ class GoogleDriveService:
             file = self.service.files().get(
                 fileId=file_id,
                 fields='id, name, mimeType, createdTime, size, webViewLink, thumbnailLink, videoMediaMetadata'
-            ).execute()
+            ).execute(num_retries=API_RETRIES)
             return file
         except Exception as e:
             print(f"Error getting file details: {e}")
             return None
     
+    def share_files(self, file_ids: list) -> set:
+        """
+        Make several files viewable by anyone with the link.
+        Permission calls go out in HTTP batches instead of one request per
+        file. Returns the IDs that were shared successfully.
+        """
+        shared = set()
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                print(f"Error creating shareable link: {exception}")
+            else:
+                shared.add(request_id)
+        
+        permission = {'type': 'anyone', 'role': 'reader'}
+        for start in range(0, len(file_ids), BATCH_LIMIT):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for file_id in file_ids[start:start + BATCH_LIMIT]:
+                batch.add(
+                    self.service.permissions().create(fileId=file_id, body=permission),
+                    request_id=file_id
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                print(f"Error creating shareable links: {e}")
+        return shared
+    
+    @staticmethod
+    def duration_seconds(file: dict) -> int:
+        """Video duration in seconds from a file's videoMediaMetadata (0 if unknown)."""
+        metadata = file.get('videoMediaMetadata') or {}
+        return int(metadata.get('durationMillis', 0)) // 1000
+    
     def create_shareable_link(self, file_id: str) -> str:
         """
         Make a file viewable by anyone with the link.
@@ -74,13 +136,13 @@ class GoogleDriveService:
             self.service.permissions().create(
                 fileId=file_id,
                 body=permission
-            ).execute()
+            ).execute(num_retries=API_RETRIES)
             
             # Get the web view link
             file = self.service.files().get(
                 fileId=file_id,
                 fields='webViewLink'
-            ).execute()
+            ).execute(num_retries=API_RETRIES)
             
             return file.get('webViewLink', '')
         except Exception as e:
@@ -96,11 +158,9 @@ class GoogleDriveService:
             file = self.service.files().get(
                 fileId=file_id,
                 fields='videoMediaMetadata'
-            ).execute()
+            ).execute(num_retries=API_RETRIES)
             
-            metadata = file.get('videoMediaMetadata', {})
-            duration_ms = metadata.get('durationMillis', 0)
-            return int(duration_ms) // 1000
+            return self.duration_seconds(file)
         except Exception as e:
             print(f"Error getting video duration: {e}")
             return 0
@@ -1,23 +1,27 @@
+import time
 from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from app.config import Config
+from app.services.google_api import API_RETRIES, build_service, get_credentials
+
+# Time zone the class schedule is entered in
+MEET_TIMEZONE = 'Asia/Kathmandu'
+
+# Partial response for event listings: only the fields callers read
+EVENT_LIST_FIELDS = (
+    'items(id,summary,start,end,htmlLink,conferenceData/entryPoints/uri),'
+    'nextPageToken'
+)
+
+# Partial response for a single event: what update_meet_event returns
+EVENT_FIELDS = 'id,htmlLink,conferenceData/entryPoints/uri'
 
 
 class GoogleMeetService:
     """Service for creating and managing Google Meet sessions via Calendar API."""
     
-    def __init__(self, tokens: dict):
-        """Initialize with user's OAuth tokens."""
-        self.credentials = Credentials(
-            token=tokens.get('access_token'),
-            refresh_token=tokens.get('refresh_token'),
-            token_uri='https://oauth2.googleapis.com/token',
-            client_id=Config.GOOGLE_CLIENT_ID,
-            client_secret=Config.GOOGLE_CLIENT_SECRET,
-            scopes=Config.GOOGLE_SCOPES
-        )
-        self.service = build('calendar', 'v3', credentials=self.credentials)
+    def __init__(self, tokens: dict, on_refresh=None):
+        """Initialize with user's OAuth tokens; on_refresh persists refreshed ones."""
+        self.credentials = get_credentials(tokens, on_refresh)
+        self.service = build_service('calendar', 'v3', self.credentials)
     
     def create_meet_event(self, title: str, start_time: datetime, 
                           duration_minutes: int = 60, attendee_emails: list = None) -> dict:
@@ -31,25 +35,17 @@ class GoogleMeetService:
         
         event = {
             'summary': title,
-            'start': {
-                'dateTime': start_time.isoformat(),
-                'timeZone': 'Asia/Kathmandu'
-            },
-            'end': {
-                'dateTime': end_time.isoformat(),
-                'timeZone': 'Asia/Kathmandu'
-            },
+            'start': {'dateTime': start_time.isoformat(), 'timeZone': MEET_TIMEZONE},
+            'end': {'dateTime': end_time.isoformat(), 'timeZone': MEET_TIMEZONE},
             'conferenceData': {
                 'createRequest': {
-                    'requestId': f'guruji-{datetime.utcnow().timestamp()}',
+                    'requestId': f'guruji-{time.time_ns()}',
                     'conferenceSolutionKey': {'type': 'hangoutsMeet'}
                 }
-            }
+            },
+            'attendees': [{'email': email} for email in attendee_emails or ()]
         }
         
-        if attendee_emails:
-            event['attendees'] = [{'email': email} for email in attendee_emails]
-        
         created_event = self.service.events().insert(
             calendarId='primary',
             body=event,
@@ -66,28 +62,23 @@ class GoogleMeetService:
     def update_meet_event(self, event_id: str, title: str = None, 
                           start_time: datetime = None, duration_minutes: int = None) -> dict:
         """Update an existing calendar event."""
-        # First get the existing event
-        event = self.service.events().get(calendarId='primary', eventId=event_id).execute()
+        # patch sends only the changed fields, so no read of the event first
+        event = {}
         
         if title:
             event['summary'] = title
         
         if start_time:
             end_time = start_time + timedelta(minutes=duration_minutes or 60)
-            event['start'] = {
-                'dateTime': start_time.isoformat(),
-                'timeZone': 'Asia/Kathmandu'
-            }
-            event['end'] = {
-                'dateTime': end_time.isoformat(),
-                'timeZone': 'Asia/Kathmandu'
-            }
+            event['start'] = {'dateTime': start_time.isoformat(), 'timeZone': MEET_TIMEZONE}
+            event['end'] = {'dateTime': end_time.isoformat(), 'timeZone': MEET_TIMEZONE}
         
-        updated_event = self.service.events().update(
+        updated_event = self.service.events().patch(
             calendarId='primary',
             eventId=event_id,
-            body=event
-        ).execute()
+            body=event,
+            fields=EVENT_FIELDS
+        ).execute(num_retries=API_RETRIES)
         
         return {
             'event_id': updated_event['id'],
@@ -98,7 +89,7 @@ class GoogleMeetService:
     def delete_meet_event(self, event_id: str) -> bool:
         """Delete a calendar event."""
         try:
-            self.service.events().delete(calendarId='primary', eventId=event_id).execute()
+            self.service.events().delete(calendarId='primary', eventId=event_id).execute(num_retries=API_RETRIES)
             return True
         except Exception as e:
             print(f"Error deleting event: {e}")
@@ -108,12 +99,22 @@ class GoogleMeetService:
         """Get upcoming calendar events."""
         now = datetime.utcnow().isoformat() + 'Z'
         
-        events_result = self.service.events().list(
+        events = self.service.events()
+        request = events.list(
             calendarId='primary',
             timeMin=now,
             maxResults=max_results,
             singleEvents=True,
-            orderBy='startTime'
-        ).execute()
+            orderBy='startTime',
+            fields=EVENT_LIST_FIELDS
+        )
+        
+        # The API may return fewer than maxResults per page; follow pages
+        # until we have enough
+        items = []
+        while request is not None and len(items) < max_results:
+            events_result = request.execute(num_retries=API_RETRIES)
+            items.extend(events_result.get('items', []))
+            request = events.list_next(request, events_result)
         
-        return events_result.get('items', [])
+        return items[:max_results]
@@ -1,33 +1,108 @@
 import requests
-import re
+from urllib3.util.retry import Retry
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
 from functools import wraps
 from flask import request, jsonify, g
 from app.config import Config
 from app.models.user import User
+from app.models.course import Course
+from app.utils.validators import validate_clerk_user_id
 
+CLERK_API_URL = 'https://api.clerk.com/v1'
+CLERK_TIMEOUT = 5
 
-def validate_clerk_user_id(user_id: str) -> bool:
-    """Validate Clerk user ID format to prevent injection."""
-    if not user_id:
-        return False
-    # Clerk user IDs typically start with 'user_' followed by alphanumeric characters
-    return bool(re.match(r'^user_[a-zA-Z0-9]+$', user_id))
+# Shared keep-alive session for Clerk's backend API: repeat calls reuse the
+# pooled TLS connection instead of handshaking every time
+_clerk_http = requests.Session()
+_clerk_http.headers.update({
+    'Authorization': f'Bearer {Config.CLERK_SECRET_KEY}',
+    'Content-Type': 'application/json'
+})
+# GETs are retried with exponential backoff on 429/5xx (honouring
+# Retry-After); the short timeout bounds how long a flaky Clerk can hold a
+# worker. Only verify_clerk_token and get_clerk_user use this session, and
+# nothing in the app calls them at present.
+_clerk_http.mount('https://', requests.adapters.HTTPAdapter(
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+))
+
+# Clerk webhooks are signed Svix-style: base64 HMAC-SHA256 over
+# "<svix-id>.<svix-timestamp>.<body>", keyed with the decoded whsec_ secret
+WEBHOOK_TOLERANCE_SECONDS = 5 * 60
+
+
+class WebhookVerificationError(Exception):
+    """Raised when a Clerk webhook signature cannot be verified."""
+
+
+def _decode_webhook_secret(secret: str) -> bytes:
+    """Decode a 'whsec_<base64>' signing secret into the raw HMAC key."""
+    if not secret:
+        return None
+    if secret.startswith('whsec_'):
+        secret = secret[len('whsec_'):]
+    try:
+        return base64.b64decode(secret)
+    except (binascii.Error, ValueError):
+        print("WARNING: CLERK_WEBHOOK_SECRET is not valid base64; webhooks will be rejected")
+        return None
+
+
+# Decoded once at import instead of on every webhook
+_WEBHOOK_KEY = _decode_webhook_secret(Config.CLERK_WEBHOOK_SECRET)
+
+
+def verify_webhook(payload: bytes, headers) -> dict:
+    """Verify a Clerk (Svix) webhook signature and return the parsed event.
+    
+    HMAC goes through hashlib/OpenSSL and signatures are compared in
+    constant time. Raises WebhookVerificationError on any failure.
+    """
+    if _WEBHOOK_KEY is None:
+        raise WebhookVerificationError('Webhook secret not configured')
+    
+    msg_id = headers.get('svix-id')
+    timestamp = headers.get('svix-timestamp')
+    signatures = headers.get('svix-signature')
+    if not msg_id or not timestamp or not signatures:
+        raise WebhookVerificationError('Missing required headers')
+    
+    # Reject stale or future-dated deliveries to prevent replays
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        raise WebhookVerificationError('Invalid timestamp')
+    if abs(time.time() - sent_at) > WEBHOOK_TOLERANCE_SECONDS:
+        raise WebhookVerificationError('Timestamp outside tolerance')
+    
+    signed_content = b'.'.join((msg_id.encode(), timestamp.encode(), payload))
+    expected = base64.b64encode(hmac.new(_WEBHOOK_KEY, signed_content, hashlib.sha256).digest())
+    
+    # Header holds space-separated "v1,<signature>" entries (key rotation)
+    for entry in signatures.split(' '):
+        version, _, signature = entry.partition(',')
+        if version == 'v1' and hmac.compare_digest(signature.encode(), expected):
+            return json.loads(payload)
+    raise WebhookVerificationError('No matching signature found')
 
 
 def verify_clerk_token(token: str) -> dict:
     """Verify Clerk session token and return user data."""
     try:
         # Use Clerk's session verification endpoint
-        headers = {
-            'Authorization': f'Bearer {Config.CLERK_SECRET_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        # Decode the session token
-        response = requests.get(
-            'https://api.clerk.com/v1/sessions',
-            headers=headers
-        )
+        response = _clerk_http.get(f'{CLERK_API_URL}/sessions', timeout=CLERK_TIMEOUT)
         
         if response.status_code == 200:
             return response.json()
@@ -40,15 +115,7 @@ def verify_clerk_token(token: str) -> dict:
 def get_clerk_user(user_id: str) -> dict:
     """Fetch user details from Clerk API."""
     try:
-        headers = {
-            'Authorization': f'Bearer {Config.CLERK_SECRET_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(
-            f'https://api.clerk.com/v1/users/{user_id}',
-            headers=headers
-        )
+        response = _clerk_http.get(f'{CLERK_API_URL}/users/{user_id}', timeout=CLERK_TIMEOUT)
         
         if response.status_code == 200:
             return response.json()
@@ -58,33 +125,44 @@ def get_clerk_user(user_id: str) -> dict:
         return None
 
 
+def _authenticate():
+    """Resolve the requesting user into g.current_user.
+    
+    Returns None on success, or the 401 error response.
+    """
+    # Get session token from cookie or header
+    session_token = request.cookies.get('__session') or \
+                   request.headers.get('Authorization', '').replace('Bearer ', '')
+    
+    if not session_token:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    # For Clerk, we'll use the __clerk_db_jwt cookie that contains user info
+    clerk_user_id = request.headers.get('X-Clerk-User-Id')
+    
+    if not clerk_user_id:
+        return jsonify({'error': 'User ID not found'}), 401
+    
+    # Validate clerk_user_id format to prevent injection attacks
+    if not validate_clerk_user_id(clerk_user_id):
+        return jsonify({'error': 'Invalid user ID format'}), 401
+    
+    # Get user from our database
+    user = User.find_by_clerk_id(clerk_user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 401
+    
+    g.current_user = user
+    return None
+
+
 def require_auth(f):
     """Decorator to require authentication."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Get session token from cookie or header
-        session_token = request.cookies.get('__session') or \
-                       request.headers.get('Authorization', '').replace('Bearer ', '')
-        
-        if not session_token:
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        # For Clerk, we'll use the __clerk_db_jwt cookie that contains user info
-        clerk_user_id = request.headers.get('X-Clerk-User-Id')
-        
-        if not clerk_user_id:
-            return jsonify({'error': 'User ID not found'}), 401
-        
-        # Validate clerk_user_id format to prevent injection attacks
-        if not validate_clerk_user_id(clerk_user_id):
-            return jsonify({'error': 'Invalid user ID format'}), 401
-        
-        # Get user from our database
-        user = User.find_by_clerk_id(clerk_user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 401
-        
-        g.current_user = user
+        error = _authenticate()
+        if error:
+            return error
         return f(*args, **kwargs)
     
     return decorated_function
@@ -92,9 +170,12 @@ def require_auth(f):
 
 def require_instructor(f):
     """Decorator to require instructor role."""
+    # One wrapper doing both checks, rather than stacking require_auth
     @wraps(f)
-    @require_auth
     def decorated_function(*args, **kwargs):
+        error = _authenticate()
+        if error:
+            return error
         if g.current_user.get('role') != 'instructor':
             return jsonify({'error': 'Instructor access required'}), 403
         return f(*args, **kwargs)
@@ -102,6 +183,29 @@ def require_instructor(f):
     return decorated_function
 
 
+def require_course_instructor(f):
+    """Decorator to require the instructor who owns the `course_id` route param.
+    
+    Only the course's instructor_id is loaded; the stub is left on g.course.
+    """
+    @wraps(f)
+    @require_instructor
+    def decorated_function(*args, **kwargs):
+        course_id = kwargs['course_id']
+        course = g.get('course')
+        if course is None or course['_id'] != course_id:
+            course = Course.find_by_id(course_id, {'instructor_id': 1})
+            if not course:
+                return jsonify({'error': 'Course not found'}), 404
+            g.course = course
+        
+        if course['instructor_id'] != g.current_user['_id']:
+            return jsonify({'error': 'Not authorized'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
 def get_current_user_from_request():
     """Extract current user from request (for templates)."""
     clerk_user_id = request.headers.get('X-Clerk-User-Id')
@@ -0,0 +1,40 @@
+"""Flask JSON provider backed by orjson."""
+import orjson
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+# Keep Flask's output semantics: sorted keys, non-str keys allowed, and
+# dates/dataclasses still go through Flask's default() hook, so raw
+# datetimes keep their HTTP-date format. Routes wanting ISO 8601 format
+# dates themselves (or in a MongoDB projection).
+_OPTIONS = (
+    orjson.OPT_SORT_KEYS
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize with orjson (C, emits bytes) instead of the stdlib json."""
+    
+    @staticmethod
+    def default(o):
+        # Raw Mongo documents can be returned as-is: ObjectIds become hex strings
+        if type(o) is ObjectId:
+            return str(o)
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # Bytes straight into the response, no str round trip
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=_OPTIONS),
+            mimetype=self.mimetype
+        )
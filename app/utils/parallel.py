@@ -0,0 +1,15 @@
+"""Run independent blocking I/O calls concurrently."""
+from concurrent.futures import ThreadPoolExecutor
+
+# PyMongo clients are thread-safe, so independent round-trips can overlap.
+# Threads are only started on first use, so this is safe to create pre-fork.
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='guruji-io')
+
+
+def run_parallel(*calls):
+    """Run zero-argument callables concurrently; return results in order.
+    
+    The first exception raised by any call is re-raised here.
+    """
+    futures = [_executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
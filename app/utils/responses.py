@@ -0,0 +1,43 @@
+"""Helpers for building JSON API responses."""
+from bson import ObjectId
+from flask import Response, current_app, stream_with_context
+
+# Reference fields that hold ObjectIds in our documents
+ID_FIELDS = ('_id', 'instructor_id', 'course_id', 'student_id')
+
+
+def to_jsonable(doc: dict, id_fields=ID_FIELDS) -> dict:
+    """Stringify the ObjectId reference fields of a document in place."""
+    for field in id_fields:
+        value = doc.get(field)
+        if type(value) is ObjectId:
+            doc[field] = str(value)
+    return doc
+
+
+def stream_json_list(items, transform=None):
+    """Stream an iterable (e.g. a PyMongo cursor) as a JSON array.
+    
+    Items are serialized one at a time as the cursor yields them, so peak
+    memory is one cursor batch rather than the whole result set.
+    """
+    dumps = current_app.json.dumps
+    
+    # Lazy cursors run their query on the first read. Do that before the
+    # 200 status and opening '[' are sent, so a failing query surfaces as
+    # a normal error response rather than a truncated body.
+    items = iter(items)
+    first = next(items, None)
+    
+    def generate():
+        if first is None:
+            yield '[]'
+            return
+        yield '[' + dumps(first if transform is None else transform(first))
+        for item in items:
+            if transform is not None:
+                item = transform(item)
+            yield ',' + dumps(item)
+        yield ']'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,24 @@
+"""Gunicorn settings for running Guruji outside Vercel.
+
+Usage: gunicorn -c gunicorn.conf.py
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'api.index:app'
+# Set TRUSTED_PROXY_HOPS when a reverse proxy sits in front of this bind
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Handlers are I/O-bound (MongoDB, Google APIs): gevent workers yield on
+# socket waits, so each worker serves many requests concurrently.
+# The gevent worker monkey-patches before the app (and pymongo) is imported.
+worker_class = 'gevent'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '1000'))
+
+# Load the app in each worker, after fork (MongoDB clients aren't fork-safe)
+preload_app = False
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,56 @@
+"""Build the indexes every model declares. Run once per deploy.
+
+Index creation is kept off the request path, so serverless cold starts
+and fresh workers never wait on createIndexes. Re-running is cheap:
+indexes that already exist are left alone.
+
+Usage (with the app's environment, e.g. MONGODB_URI and SECRET_KEY, set):
+    python scripts/create_indexes.py
+
+Exits non-zero if any index could not be built. A unique index usually
+fails because existing documents violate it; see
+scripts/dedupe_unique_indexes.py.
+"""
+import sys
+import os
+
+# Add parent directory to path so 'app' module can be found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ensure_indexes
+from app.models.certificate import Certificate
+from app.models.course import Course
+from app.models.enrollment import Enrollment
+from app.models.note import Note
+from app.models.recording import Recording
+from app.models.user import User
+
+MODELS = (User, Course, Enrollment, Note, Recording, Certificate)
+
+
+def report_failures(model, failures):
+    """Print each failed index; returns how many there were."""
+    for index, error in failures:
+        spec = index.document
+        print(f"ERROR: index {spec['name']} on {model.collection_name} was not created: {error}",
+              file=sys.stderr)
+        if spec.get('unique'):
+            # Code relying on this index (duplicate-key handling) is not protected
+            print(f"ERROR: uniqueness of {model.collection_name}.{spec['name']} is NOT enforced; "
+                  f"run scripts/dedupe_unique_indexes.py to find the conflicting documents",
+                  file=sys.stderr)
+    return len(failures)
+
+
+def main():
+    failed = 0
+    for model in MODELS:
+        failures = ensure_indexes(model)
+        failed += report_failures(model, failures)
+        if not failures:
+            print(f"{model.collection_name}: {len(model.indexes)} index(es) ok")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Find (and optionally remove) duplicates that block the unique indexes.
+
+The models declare unique indexes that older data may violate (duplicate
+enrollments/certificates from the old find-then-insert race, recordings
+imported twice by concurrent syncs). MongoDB refuses to build such an index,
+and the app then runs without the uniqueness its duplicate-key handling
+relies on.
+
+Usage (with the app's environment, e.g. MONGODB_URI and SECRET_KEY, set):
+    python scripts/dedupe_unique_indexes.py           # report duplicates only
+    python scripts/dedupe_unique_indexes.py --apply   # delete them, then build the indexes
+
+Within each duplicate group one document is kept: the oldest, except for
+enrollments, where the one with the most attendance wins. Duplicate users
+are only reported, since enrollments and courses point at a specific user
+_id; merge those by hand.
+"""
+import sys
+import os
+
+# Add parent directory to path so 'app' module can be found
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import get_db, ensure_indexes
+from app.models.certificate import Certificate
+from app.models.enrollment import Enrollment
+from app.models.recording import Recording
+from app.models.user import User
+# Sibling script (this directory is on sys.path when run as a script)
+from create_indexes import report_failures
+
+MODELS = (User, Enrollment, Certificate, Recording)
+
+# Models whose duplicates are reported but never deleted
+REPORT_ONLY = {User}
+
+# Which document of a duplicate group is kept (the first in this order)
+KEEP_ORDER = {
+    Enrollment: {'attendance_count': -1, '_id': 1}
+}
+
+
+def find_duplicates(collection, spec, keep_order):
+    """Yield (key, [_id, ...]) for each group violating a unique index spec."""
+    fields = list(spec['key'])
+    pipeline = []
+    if spec.get('partialFilterExpression'):
+        pipeline.append({'$match': spec['partialFilterExpression']})
+    pipeline += [
+        {'$sort': keep_order},
+        {'$group': {
+            '_id': {field: f'${field}' for field in fields},
+            'ids': {'$push': '$_id'},
+            'count': {'$sum': 1}
+        }},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        yield group['_id'], group['ids']
+
+
+def main(apply=False):
+    db = get_db()
+    found = 0
+    for model in MODELS:
+        collection = db[model.collection_name]
+        keep_order = KEEP_ORDER.get(model, {'_id': 1})
+        for index in model.indexes:
+            spec = index.document
+            if not spec.get('unique'):
+                continue
+            for key, ids in find_duplicates(collection, spec, keep_order):
+                found += 1
+                keep, drop = ids[0], ids[1:]
+                print(f"{model.collection_name} {spec['name']} {key}: keep {keep}, duplicates {drop}")
+                if apply and model not in REPORT_ONLY:
+                    collection.delete_many({'_id': {'$in': drop}})
+        if apply:
+            report_failures(model, ensure_indexes(model))
+    
+    if not found:
+        print("No duplicates found.")
+    elif not apply:
+        print(f"{found} duplicate group(s) found; re-run with --apply to remove them.")
+
+
+if __name__ == '__main__':
+    main(apply='--apply' in sys.argv[1:])
@@ -0,0 +1,37 @@
+"""Server-side session round trip against a real MongoDB.
+
+Needs the app's dependencies and MONGODB_URI pointing at a test database.
+"""
+import os
+import pytest
+
+os.environ.setdefault('FLASK_ENV', 'development')
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv('MONGODB_URI'), reason='MONGODB_URI not set'
+)
+
+
+def test_session_is_readable_on_the_next_request():
+    """A stored session (e.g. the Google OAuth state) loads on the follow-up request."""
+    from flask import session
+    from app import create_app
+    
+    app = create_app()
+    
+    @app.route('/_test/session/set')
+    def set_session():
+        session['google_oauth_state'] = 'state-123'
+        return ''
+    
+    @app.route('/_test/session/get')
+    def get_session():
+        return session.get('google_oauth_state', '')
+    
+    client = app.test_client()
+    assert client.get('/_test/session/set').status_code == 200
+    
+    # The test client sends the session cookie back, as the browser would
+    response = client.get('/_test/session/get')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == 'state-123'